@@ -1,4 +1,5 @@
 from ._cuvis_il import cuvis_il
+from . import handles
 from .Async import Async, AsyncMesu
 from .Calibration import Calibration
 from .Measurement import Measurement
@@ -14,7 +15,7 @@ import cuvis.cuvis_types as internal
 import asyncio as a
 
 
-class AcquisitionContext(object):
+class AcquisitionContext(handles.HandleOwner):
     def __init__(
         self, base: Union[Calibration, SessionFile], *, simulate: bool = False
     ):
@@ -41,7 +42,7 @@ class AcquisitionContext(object):
             raise SDKException(
                 "Could not interpret input of type {}.".format(type(base))
             )
-        pass
+        handles._register(self)
 
     @property
     @copydoc(cuvis_il.cuvis_acq_cont_get_state)
@@ -613,11 +614,12 @@ class AcquisitionContext(object):
             yield Component(self, i)
         pass
 
-    def __del__(self):
+    def _free(self, handle: int) -> None:
+        self.reset_state_change_callback()
+        self.reset_ready_callback()
         _ptr = cuvis_il.new_p_int()
-        cuvis_il.p_int_assign(_ptr, self._handle)
+        cuvis_il.p_int_assign(_ptr, handle)
         cuvis_il.cuvis_acq_cont_free(_ptr)
-        self._handle = cuvis_il.p_int_value(_ptr)
 
     def __deepcopy__(self, memo):
         """This functions is not permitted due to the class only keeping a handle, that is managed by the cuvis sdk."""
@@ -2,6 +2,7 @@ import os
 from pathlib import Path
 
 from ._cuvis_il import cuvis_il
+from . import handles
 from .SessionFile import SessionFile
 from .cuvis_aux import SDKException, Capabilities, CalibrationInfo
 from .cuvis_types import OperationMode
@@ -11,7 +12,7 @@ import cuvis.cuvis_types as internal
 from typing import Union
 
 
-class Calibration(object):
+class Calibration(handles.HandleOwner):
 
     def __init__(self, base: Union[Path, str, SessionFile]):
         self._handle = None
@@ -27,6 +28,7 @@ class Calibration(object):
         if cuvis_il.status_ok != retval:
             raise SDKException()
         self._handle = cuvis_il.p_int_value(_ptr)
+        handles._register(self)
 
     def get_capabilities(self, operation_mode: OperationMode) -> Capabilities:
 
@@ -50,9 +52,9 @@ class Calibration(object):
         _id = cuvis_il.cuvis_calib_get_id_swig(self._handle)
         return _id
 
-    def __del__(self):
+    def _free(self, handle: int) -> None:
         _ptr = cuvis_il.new_p_int()
-        cuvis_il.p_int_assign(_ptr, self._handle)
+        cuvis_il.p_int_assign(_ptr, handle)
         cuvis_il.cuvis_calib_free(_ptr)
 
     def __deepcopy__(self, memo):
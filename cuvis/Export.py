@@ -1,26 +1,27 @@
 from ._cuvis_il import cuvis_il
+from . import handles
 from .cuvis_aux import SDKException
 
 from .Measurement import Measurement
 from .FileWriteSettings import GeneralExportSettings, EnviExportSettings, TiffExportSettings, ViewExportSettings, SaveArgs
 
 
-class Exporter(object):
+class Exporter(handles.HandleOwner):
     def __init__(self):
         self._handle = None
         pass
 
-    def __del__(self):
+    def _free(self, handle: int) -> None:
         _ptr = cuvis_il.new_p_int()
-        cuvis_il.p_int_assign(_ptr, self._handle)
+        cuvis_il.p_int_assign(_ptr, handle)
         cuvis_il.cuvis_exporter_free(_ptr)
-        pass
 
-    def apply(self, mesu: Measurement) -> Measurement:
+    def apply(self, mesu: Measurement, refresh: bool = True) -> Measurement:
+        mesu._require_handle()
         if cuvis_il.status_ok != cuvis_il.cuvis_exporter_apply(self._handle,
                                                                mesu._handle):
             raise SDKException()
-        mesu.refresh()
+        mesu._applied(refresh)
         return mesu
 
     def flush(self):
@@ -53,6 +54,7 @@ class CubeExporter(Exporter):
                                                                      fs):
             raise SDKException()
         self._handle = cuvis_il.p_int_value(_ptr)
+        handles._register(self)
         pass
 
 
@@ -65,6 +67,7 @@ class TiffExporter(Exporter):
                                                                      fs):
             raise SDKException()
         self._handle = cuvis_il.p_int_value(_ptr)
+        handles._register(self)
         pass
 
 
@@ -76,6 +79,7 @@ class EnviExporter(Exporter):
         if cuvis_il.status_ok != cuvis_il.cuvis_exporter_create_envi(_ptr, ge):
             raise SDKException()
         self._handle = cuvis_il.p_int_value(_ptr)
+        handles._register(self)
         pass
 
 
@@ -88,4 +92,5 @@ class ViewExporter(Exporter):
                                                                      fs):
             raise SDKException()
         self._handle = cuvis_il.p_int_value(_ptr)
+        handles._register(self)
         pass
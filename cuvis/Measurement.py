@@ -1,11 +1,16 @@
-from typing import Union
+from typing import Iterable, Optional, Union
 from .FileWriteSettings import SaveArgs
+from dataclasses import dataclass
 import datetime
+import fnmatch
+import hashlib
 import os
+import threading
 import numpy as np
 from pathlib import Path
 
 from ._cuvis_il import cuvis_il
+from . import handles
 from .cuvis_aux import SDKException, SessionData, Capabilities, MeasurementFlags, SensorInfo, GPSData
 from .cuvis_types import DataFormat, ProcessingMode, ReferenceType
 from .cube_utils import ImageData
@@ -14,8 +19,267 @@ from .cube_utils import ImageData
 import cuvis.cuvis_types as internal
 base_datetime = datetime.datetime(1970, 1, 1)
 
+_NOT_LOADED = object()
+
+
+def _fetch_image(handle: int, key: str):
+    data = cuvis_il.cuvis_imbuffer_t()
+    cuvis_il.cuvis_measurement_get_data_image(handle, key, data)
+    return data
+
+
+def _image_from_buffer(data) -> ImageData:
+    return ImageData(img_buf=data,
+                     dformat=DataFormat[data.__getattribute__("format")])
+
+
+def _buffer_signature(img_buf) -> Optional[tuple]:
+    """
+    Identifies the SDK memory behind an image buffer. Returns None if the
+    pointers cannot be read, such buffers are never considered unchanged.
+    """
+    if img_buf is None:
+        return None
+    try:
+        raw = int(img_buf.raw) if img_buf.raw is not None else 0
+        wavelength = int(img_buf.wavelength) if img_buf.wavelength is not None else 0
+    except (TypeError, ValueError):
+        return None
+    return (raw, wavelength, img_buf.width, img_buf.height, img_buf.channels,
+            img_buf.format)
+
+
+def _fetch_data(handle: int, key: str, cdtype):
+    if cdtype == cuvis_il.data_type_image:
+        return _image_from_buffer(_fetch_image(handle, key))
+    elif cdtype == cuvis_il.data_type_string:
+        return cuvis_il.cuvis_measurement_get_data_string_swig(handle, key)
+    elif cdtype == cuvis_il.data_type_gps:
+        gps = cuvis_il.cuvis_gps_t()
+        cuvis_il.cuvis_measurement_get_data_gps(handle, key, gps)
+        return GPSData._from_internal(gps)
+    elif cdtype == cuvis_il.data_type_sensor_info:
+        info = cuvis_il.cuvis_sensor_info_t()
+        cuvis_il.cuvis_measurement_get_data_sensor_info(handle, key, info)
+        return SensorInfo._from_internal(info)
+    return "Not Implemented!"
+
+
+def _key_patterns(keys: Optional[Union[str, Iterable[str]]]) -> Optional[frozenset]:
+    """
+    Normalizes a key selection; a single string is one pattern, not a
+    collection of characters.
+    """
+    if keys is None:
+        return None
+    if isinstance(keys, str):
+        return frozenset((keys,))
+    return frozenset(keys)
+
+
+def _key_selected(key: str, patterns: Optional[Iterable[str]]) -> bool:
+    return patterns is None or any(fnmatch.fnmatchcase(key, p) for p in patterns)
+
+
+class MeasurementData(dict):
+    """
+    The data items of a Measurement, fetched from the SDK on first access.
+
+    Keys and data types are enumerated up front, so membership tests and
+    `keys()` are free; an item is only fetched when it is read, and stays
+    cached afterwards. Iterating over values or items loads every item.
+    Once the measurement is refreshed or freed, items that were not loaded
+    yet can no longer be fetched.
+
+    With `keys`, a collection of glob patterns such as {"cube", "view_*"},
+    only matching items are part of the mapping; `available` still lists
+    every item of the measurement.
+
+    Given the mapping of the previous refresh, images that were loaded
+    there and still refer to the same SDK buffer are taken over instead
+    of being fetched again.
+    """
+
+    def __init__(self, handle: Optional[int] = None, keys: Optional[Iterable[str]] = None,
+                 previous: Optional["MeasurementData"] = None):
+        super().__init__()
+        self._handle = handle
+        self._types = {}
+        self._lock = threading.Lock()
+        if handle is None:
+            return
+        keys = _key_patterns(keys)
+        pcount = cuvis_il.new_p_int()
+        if cuvis_il.status_ok != cuvis_il.cuvis_measurement_get_data_count(
+                handle, pcount):
+            raise SDKException()
+        for ind in range(cuvis_il.p_int_value(pcount)):
+            pType = cuvis_il.new_p_cuvis_data_type_t()
+            key = cuvis_il.cuvis_measurement_get_data_info_swig(handle,
+                                                                pType, ind)
+            cdtype = cuvis_il.p_cuvis_data_type_t_value(pType)
+            self._types[key] = cdtype
+            if _key_selected(key, keys):
+                dict.__setitem__(self, key, self._carry_over(previous, key, cdtype))
+
+    def _carry_over(self, previous: Optional["MeasurementData"], key: str, cdtype):
+        if previous is None or cdtype != cuvis_il.data_type_image \
+                or previous._types.get(key) != cdtype:
+            return _NOT_LOADED
+        old = dict.get(previous, key, _NOT_LOADED)
+        if not isinstance(old, ImageData) or old.owns_data:
+            return _NOT_LOADED
+        img_buf = _fetch_image(self._handle, key)
+        signature = _buffer_signature(img_buf)
+        if signature is not None and signature == _buffer_signature(old._img_buf):
+            # same memory, derived data may still be outdated
+            old._pyramid = None
+            return old
+        return _image_from_buffer(img_buf)
+
+    def _invalidate(self, images: bool = False) -> None:
+        self._handle = None
+        if not images:
+            return
+        # the SDK memory of loaded images goes away with the measurement,
+        # clearing them makes later use raise instead of reading freed memory
+        for val in dict.values(self):
+            if isinstance(val, ImageData) and not val.owns_data:
+                val.array = None
+                val._img_buf = None
+
+    @property
+    def available(self) -> tuple[str, ...]:
+        """All data items of the measurement, selected or not."""
+        return tuple(self._types)
+
+    def is_loaded(self, key: str) -> bool:
+        return dict.__getitem__(self, key) is not _NOT_LOADED
+
+    def __getitem__(self, key):
+        val = dict.__getitem__(self, key)
+        if val is not _NOT_LOADED:
+            return val
+        with self._lock:
+            val = dict.__getitem__(self, key)
+            if val is _NOT_LOADED:
+                if self._handle is None:
+                    raise ValueError(
+                        "Data item '{}' was not loaded before the Measurement "
+                        "was refreshed or released.".format(key))
+                val = _fetch_data(self._handle, key, self._types[key])
+                dict.__setitem__(self, key, val)
+        return val
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def values(self):
+        return [self[key] for key in self.keys()]
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def pop(self, key, *default):
+        if key in self:
+            val = self[key]
+            dict.__delitem__(self, key)
+            return val
+        return dict.pop(self, key, *default)
+
+    def popitem(self):
+        key = next(reversed(self.keys()))
+        return key, self.pop(key)
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def copy(self) -> dict:
+        return dict(self.items())
+
+    def __eq__(self, other):
+        return dict(self.items()) == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return repr({key: (val if val is not _NOT_LOADED else "<not loaded>")
+                     for key, val in dict.items(self)})
+
+
+@dataclass(frozen=True)
+class MeasurementMetadata(object):
+    capture_time: datetime.datetime
+    measurement_flags: MeasurementFlags
+    path: str
+    comment: str
+    factory_calibration: Optional[datetime.datetime]
+    assembly: str
+    integration_time: int
+    averages: int
+    distance: float
+    serial_number: str
+    product_name: str
+    processing_mode: ProcessingMode
+    name: str
+    session_info: SessionData
+    frame_id: int
+    file: Optional[Path] = None  # file the metadata was read from
+
+    def __repr__(self):
+        return "'Measurement metadata: {}, frame {}, {}, {}'".format(
+            self.name, self.frame_id, self.capture_time, self.processing_mode)
+
+    def open(self) -> "Measurement":
+        """
+        Loads the full Measurement this metadata was read from.
+        """
+        return Measurement(self.file if self.file is not None else self.path)
+
+    @classmethod
+    def _from_handle(cls, handle: int, file: Optional[Path] = None):
+        _metaData = cuvis_il.cuvis_mesu_metadata_allocate()
+        try:
+            if cuvis_il.status_ok != cuvis_il.cuvis_measurement_get_metadata(
+                    handle, _metaData):
+                raise SDKException()
+            try:
+                factory_calibration = base_datetime + datetime.timedelta(
+                    milliseconds=_metaData.factory_calibration)
+            except OverflowError:
+                factory_calibration = None
+            return cls(
+                capture_time=base_datetime + datetime.timedelta(
+                    milliseconds=_metaData.capture_time),
+                measurement_flags=MeasurementFlags(_metaData.measurement_flags),
+                path=_metaData.path,
+                comment=_metaData.comment,
+                factory_calibration=factory_calibration,
+                assembly=_metaData.assembly,
+                integration_time=_metaData.integration_time,
+                averages=_metaData.averages,
+                distance=_metaData.distance,
+                serial_number=_metaData.serial_number,
+                product_name=_metaData.product_name,
+                processing_mode=internal.__ProcessingMode__[
+                    _metaData.processing_mode],
+                name=_metaData.name,
+                session_info=SessionData(_metaData.session_info_name,
+                                         _metaData.session_info_session_no,
+                                         _metaData.session_info_sequence_no),
+                frame_id=_metaData.measurement_frame_id,
+                file=file)
+        finally:
+            cuvis_il.cuvis_mesu_metadata_free(_metaData)
+
 
-class Measurement(object):
+class Measurement(handles.HandleOwner):
     capture_time: datetime.datetime  # read-only
     measurement_flags: MeasurementFlags  # read-only
     path: str  # read-only
@@ -32,9 +296,10 @@ class Measurement(object):
     session_info: SessionData  # read-only
     frame_id: int  # read-only
 
-    def __init__(self, base: Union[int, str, Path]):
+    def __init__(self, base: Union[int, str, Path], keys: Optional[Iterable[str]] = None):
         self._handle = None
         self._session = None
+        self._keys = _key_patterns(keys)
 
         if isinstance(base, int):
             self._handle = base
@@ -52,82 +317,114 @@ class Measurement(object):
         else:
             raise ValueError(
                 "Could not open Measurement! Unknown Input")
+        handles._register(self)
+        self._stale = False
         self.refresh()
         pass
 
+    @property
+    def data(self) -> dict:
+        """
+        The data items of this measurement, see MeasurementData.
+
+        Refreshed on access if the measurement was modified by an
+        operation applied with `refresh=False`; the metadata properties
+        are updated right away in that case.
+        """
+        if self._stale and self._handle is not None:
+            self.refresh()
+        return self._data
+
+    @data.setter
+    def data(self, data: dict) -> None:
+        self._data = data
+
+    def _require_handle(self) -> None:
+        if self._handle is None:
+            raise ValueError("This Measurement has been released.")
+
+    def _applied(self, refresh: bool) -> None:
+        # the SDK modified the measurement, e.g. ProcessingContext.apply
+        if refresh:
+            self.refresh()
+        else:
+            # chained operations, refreshed on the next access of data
+            self._mark_stale()
+
+    def _mark_stale(self) -> None:
+        # metadata is cheap to read, only the data items are deferred
+        self._refresh_metadata()
+        self._stale = True
+
     def _refresh_metadata(self):
-        _metaData = cuvis_il.cuvis_mesu_metadata_allocate()
-        if cuvis_il.status_ok != cuvis_il.cuvis_measurement_get_metadata(
-                self._handle, _metaData):
-            raise SDKException
-
-        self._capture_time = base_datetime + datetime.timedelta(
-            milliseconds=_metaData.capture_time)
-        self._measurement_flags = MeasurementFlags(_metaData.measurement_flags)
-        self._path = _metaData.path
-        self._comment = _metaData.comment
+        meta = MeasurementMetadata._from_handle(self._handle)
+        self._capture_time = meta.capture_time
+        self._measurement_flags = meta.measurement_flags
+        self._path = meta.path
+        self._comment = meta.comment
+        self._factory_calibration = meta.factory_calibration
+        self._assembly = meta.assembly
+        self._averages = meta.averages
+        self._distance = meta.distance
+        self._integration_time = meta.integration_time
+        self._serial_number = meta.serial_number
+        self._product_name = meta.product_name
+        self._processing_mode = meta.processing_mode
+        self._name = meta.name
+        self._session_info = meta.session_info
+        self._frame_id = meta.frame_id
+
+    @classmethod
+    def open_metadata(cls, path: Union[str, Path]) -> "MeasurementMetadata":
+        """
+        Reads only the metadata of a measurement file.
+
+        No data items are enumerated or fetched and the SDK measurement is
+        freed right away, which makes this suitable for indexing large
+        numbers of files. Use `MeasurementMetadata.open()` to load the
+        full Measurement later.
+        """
+        path = Path(path)
+        if not path.exists():
+            raise FileNotFoundError(
+                'Could not open Measurement. File does not exists.')
+        _ptr = cuvis_il.new_p_int()
+        if cuvis_il.status_ok != cuvis_il.cuvis_measurement_load(str(path),
+                                                                 _ptr):
+            raise SDKException()
+        handle = cuvis_il.p_int_value(_ptr)
         try:
-            self._factory_calibration = base_datetime + datetime.timedelta(
-                milliseconds=_metaData.factory_calibration)
-        except OverflowError:
-            self._factory_calibration = None
-        self._assembly = _metaData.assembly
-        self._averages = _metaData.averages
-        self._distance = _metaData.distance
-        self._integration_time = _metaData.integration_time
-        self._serial_number = _metaData.serial_number
-        self._product_name = _metaData.product_name
-        self._processing_mode = internal.__ProcessingMode__[
-            _metaData.processing_mode]
-        self._name = _metaData.name
-        self._session_info = SessionData(_metaData.session_info_name,
-                                         _metaData.session_info_session_no,
-                                         _metaData.session_info_sequence_no)
-        self._frame_id = _metaData.measurement_frame_id
-        cuvis_il.cuvis_mesu_metadata_free(_metaData)
+            return MeasurementMetadata._from_handle(handle, file=path)
+        finally:
+            cuvis_il.p_int_assign(_ptr, handle)
+            cuvis_il.cuvis_measurement_free(_ptr)
+
+    def refresh(self, keys: Optional[Iterable[str]] = None) -> None:
+        """
+        Reloads the metadata and enumerates the data items, which are
+        fetched lazily on first access. Images that were already loaded
+        and whose SDK buffer did not change are kept.
 
-    def refresh(self) -> None:
-        self.data = {}
+        `keys` (glob patterns, e.g. {"cube", "view_*"}) replaces the set of
+        data items selected at construction; the selection is kept for
+        later refreshes, e.g. after `ProcessingContext.apply`.
+        """
+        self._require_handle()
+        if keys is not None:
+            self._keys = _key_patterns(keys)
+        old = getattr(self, "_data", None)
+        if not isinstance(old, MeasurementData):
+            old = None
+        self._stale = False
         self._refresh_metadata()
-        pcount = cuvis_il.new_p_int()
-        if cuvis_il.status_ok != cuvis_il.cuvis_measurement_get_data_count(
-                self._handle, pcount):
-            raise SDKException()
-        for ind in range(cuvis_il.p_int_value(pcount)):
-            pType = cuvis_il.new_p_cuvis_data_type_t()
-            key = cuvis_il.cuvis_measurement_get_data_info_swig(self._handle,
-                                                                pType, ind)
-            cdtype = cuvis_il.p_cuvis_data_type_t_value(pType)
-            if cdtype == cuvis_il.data_type_image:
-                data = cuvis_il.cuvis_imbuffer_t()
-                cuvis_il.cuvis_measurement_get_data_image(self._handle,
-                                                          key,
-                                                          data)
-                # t0 = datetime.datetime.now()
-                self.data.update({key: ImageData(img_buf=data,
-                                                 dformat=DataFormat[
-                                                     data.__getattribute__(
-                                                         "format")])})
-                # print("image loading time: {}".format(
-                # datetime.datetime.now() - t0))
-            elif cdtype == cuvis_il.data_type_string:
-                val = cuvis_il.cuvis_measurement_get_data_string_swig(
-                    self._handle, key)
-                self.data.update({key: val})
-            elif cdtype == cuvis_il.data_type_gps:
-                gps = cuvis_il.cuvis_gps_t()
-                cuvis_il.cuvis_measurement_get_data_gps(self._handle, key,
-                                                        gps)
-                self.data.update({key: GPSData._from_internal(gps)})
-            elif cdtype == cuvis_il.data_type_sensor_info:
-                info = cuvis_il.cuvis_sensor_info_t()
-                cuvis_il.cuvis_measurement_get_data_sensor_info(self._handle,
-                                                                key, info)
-                self.data.update({key: SensorInfo._from_internal(info)})
-            else:
-                self.data.update({key: "Not Implemented!"})
+        try:
+            self._data = MeasurementData(self._handle, self._keys, previous=old)
+        finally:
+            if old is not None:
+                old._invalidate()
 
     def save(self, saveargs: SaveArgs) -> None:
+        self._require_handle()
         ge, sa = saveargs._get_internal()
         if cuvis_il.status_ok != cuvis_il.cuvis_measurement_save(
                 self._handle, ge.export_dir, sa):
@@ -152,6 +449,7 @@ class Measurement(object):
 
     @comment.setter
     def comment(self, comment: str) -> None:
+        self._require_handle()
         if cuvis_il.status_ok != cuvis_il.cuvis_measurement_set_comment(
                 self._handle, comment):
             raise SDKException()
@@ -196,6 +494,7 @@ class Measurement(object):
 
     @name.setter
     def name(self, name: str) -> None:
+        self._require_handle()
         if cuvis_il.status_ok != cuvis_il.cuvis_measurement_set_name(
                 self._handle, name):
             raise SDKException()
@@ -236,6 +535,12 @@ class Measurement(object):
         """
         if 'cube' in self.data:
             return self.data.get('cube')
+        if self._handle is None:
+            raise ValueError(
+                "This Measurement has been released without keeping its cube.")
+        if isinstance(self.data, MeasurementData) and 'cube' in self.data.available:
+            raise ValueError(
+                "The 'cube' is not among the selected keys, refresh with keys including it.")
         if self._session is not None:
             # try fallback if session is known
             if self._session._pc is None:
@@ -248,18 +553,53 @@ class Measurement(object):
 
     @property
     def thumbnail(self):
-        thumb = [val for key, val in self.data.items() if "view" in key]
+        return self.get_thumbnail()
+
+    def get_thumbnail(self, size: Optional[Union[int, tuple[int, int]]] = None) -> Optional[ImageData]:
+        """
+        Returns a preview image of the measurement.
+
+        Without `size`, the smallest available "view" image is returned.
+        With `size` (longer edge or (height, width)), the preview is served
+        from the image pyramid of the smallest view that is large enough,
+        falling back to the cube if no view image is available.
+        """
+        thumb = [self.data[key] for key in self.data.keys() if "view" in key]
         if len(thumb) == 0:
+            if size is not None and 'cube' in self.data:
+                return self.data['cube'].preview(size)
             print("No thumbnail available. Use cube instead!")
             return None
-        elif len(thumb) == 1:
+        thumb.sort(key=lambda th: th.array.shape)
+        if size is None:
             return thumb[0]
-        elif len(thumb) > 1:
-            shapes = [th.array.shape for th in thumb]
-            return thumb[shapes.index(min(shapes))]
+        for th in thumb:
+            if th.covers(size):
+                return th.preview(size)
+        return thumb[-1]
+
+    def fingerprint(self, samples: int = 4096, digest_size: int = 16) -> str:
+        """
+        Returns a hex digest identifying the recorded frame.
+
+        Combines the acquisition metadata (serial number, capture time,
+        frame id, integration time, averages, processing mode) with a
+        strided sample of the cube, see `ImageData.fingerprint`. The file
+        path and name are left out, so copies of a recording match. Never
+        triggers processing; without a cube only the metadata is hashed.
+        """
+        h = hashlib.blake2b(digest_size=digest_size)
+        h.update(repr((self.serial_number, self.capture_time.isoformat(), self.frame_id,
+                       self.integration_time, self.averages,
+                       self.processing_mode.name)).encode())
+        cube = self.data.get("cube")
+        if isinstance(cube, ImageData) and cube.array is not None:
+            cube._update_hash(h, samples)
+        return h.hexdigest()
 
     @property
     def capabilities(self) -> Capabilities:
+        self._require_handle()
         _ptr = cuvis_il.new_p_int()
         if cuvis_il.status_ok != cuvis_il.cuvis_measurement_get_capabilities(
                 self._handle, _ptr):
@@ -268,28 +608,33 @@ class Measurement(object):
 
     @property
     def calibration_id(self) -> str:
+        self._require_handle()
         _id = cuvis_il.cuvis_measurement_get_calib_id_swig(self._handle)
         return _id
 
     @property
     def data_count(self) -> int:
+        self._require_handle()
         out = cuvis_il.new_p_int()
         cuvis_il.cuvis_measurement_get_data_count(self._handle, out)
         return cuvis_il.p_int_value(out)
 
     def clear_cube(self) -> None:
+        self._require_handle()
         if cuvis_il.status_ok != cuvis_il.cuvis_measurement_clear_cube(
                 self._handle):
             raise SDKException()
         pass
 
     def clear_implicit_reference(self, ref_type: ReferenceType) -> None:
+        self._require_handle()
         if cuvis_il.status_ok != \
                 cuvis_il.cuvis_measurement_clear_implicit_reference(
                     self._handle, internal.__CuvisReferenceType__[ref_type]):
             raise SDKException()
 
     def deepcopy(self):
+        self._require_handle()
         _ptr = cuvis_il.new_p_int()
         if cuvis_il.status_ok != cuvis_il.cuvis_measurement_deep_copy(
                 self._handle, _ptr):
@@ -297,13 +642,64 @@ class Measurement(object):
         copy = Measurement(cuvis_il.p_int_value(_ptr))
         return copy
 
-    def __del__(self):
+    def release(self, keep: Iterable[str] = ("cube",)) -> None:
+        """
+        Frees the SDK measurement and all of its data except the entries in `keep`.
+
+        Kept images are copied into Python-owned memory first, metadata
+        properties stay available. Loaded images that were not kept are
+        cleared, using them afterwards raises a ValueError, as does any
+        further call that needs the SDK measurement.
+        """
+        kept = MeasurementData()
+        keep = list(keep)
+        # nothing kept, a stale measurement does not need a refresh first
+        data = self.data if keep else {}
+        for key in keep:
+            if key not in data:
+                continue
+            val = data[key]
+            if isinstance(val, ImageData):
+                val.detach()
+            kept[key] = val
+        self._close_handle()
+        self._data = kept
+
+    def close(self) -> None:
+        """
+        Frees the SDK measurement and its data right away instead of on
+        garbage collection. Images of this measurement are cleared unless
+        they were detached. Further calls do nothing.
+        """
+        if getattr(self, "_handle", None) is None:
+            return
+        self.release(keep=())
+
+    def _native_bytes(self) -> int:
+        """
+        Size of all image items the SDK holds for this measurement, taken
+        from the buffer dimensions without fetching the images as arrays.
+        """
+        data = getattr(self, "_data", None)
+        if self._handle is None or not isinstance(data, MeasurementData):
+            return 0
+        total = 0
+        for key, cdtype in data._types.items():
+            if cdtype != cuvis_il.data_type_image:
+                continue
+            img_buf = _fetch_image(self._handle, key)
+            itemsize = np.dtype(DataFormat.get(img_buf.format, np.uint8)).itemsize
+            total += img_buf.width * img_buf.height * img_buf.channels * itemsize
+        return total
+
+    def _free(self, handle: int) -> None:
+        if isinstance(getattr(self, "_data", None), MeasurementData):
+            self._data._invalidate(images=True)
+        if cuvis_il.status_ok != cuvis_il.cuvis_measurement_clear_cube(handle):
+            raise SDKException()
         _ptr = cuvis_il.new_p_int()
-        self.clear_cube()
-        cuvis_il.p_int_assign(_ptr, self._handle)
+        cuvis_il.p_int_assign(_ptr, handle)
         cuvis_il.cuvis_measurement_free(_ptr)
-        self._handle = cuvis_il.p_int_value(_ptr)
-        pass
 
     def __deepcopy__(self, memo):
         return self.deepcopy()
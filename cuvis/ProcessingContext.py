@@ -1,4 +1,5 @@
 from ._cuvis_il import cuvis_il
+from . import handles
 from .Calibration import Calibration
 from .FileWriteSettings import ProcessingArgs
 from .Measurement import Measurement
@@ -13,7 +14,7 @@ from typing import Union
 import dataclasses
 
 
-class ProcessingContext(object):
+class ProcessingContext(handles.HandleOwner):
     def __init__(
         self,
         base: Union[Calibration, SessionFile, Measurement],
@@ -47,21 +48,23 @@ class ProcessingContext(object):
             raise SDKException(
                 "could not interpret input of type {}.".format(type(base))
             )
-        pass
+        handles._register(self)
 
-    def apply(self, mesu: Measurement) -> Measurement:
+    def apply(self, mesu: Measurement, refresh: bool = True) -> Measurement:
         if isinstance(mesu, Measurement):
+            mesu._require_handle()
             if cuvis_il.status_ok != cuvis_il.cuvis_proc_cont_apply(
                 self._handle, mesu._handle
             ):
                 raise SDKException()
-            mesu.refresh()
+            mesu._applied(refresh)
             return mesu
         else:
             raise SDKException("Can only apply ProcessingContext to Measurement!")
         pass
 
     def set_reference(self, mesu: Measurement, refType: ReferenceType) -> None:
+        mesu._require_handle()
         if cuvis_il.status_ok != cuvis_il.cuvis_proc_cont_set_reference(
             self._handle, mesu._handle, internal.__CuvisReferenceType__[refType]
         ):
@@ -119,6 +122,7 @@ class ProcessingContext(object):
         return dataclasses.replace(self._modeArgs)
 
     def is_capable(self, mesu: Measurement, pa: ProcessingArgs) -> bool:
+        mesu._require_handle()
         args = pa._get_internal()
         _ptr = cuvis_il.new_p_int()
         if cuvis_il.status_ok != cuvis_il.cuvis_proc_cont_is_capable(
@@ -139,12 +143,10 @@ class ProcessingContext(object):
         _id = cuvis_il.cuvis_proc_cont_get_calib_id_swig(self._handle)
         return _id
 
-    def __del__(self):
+    def _free(self, handle: int) -> None:
         _ptr = cuvis_il.new_p_int()
-        cuvis_il.p_int_assign(_ptr, self._handle)
+        cuvis_il.p_int_assign(_ptr, handle)
         cuvis_il.cuvis_proc_cont_free(_ptr)
-        self._handle = cuvis_il.p_int_value(_ptr)
-        pass
 
     def __deepcopy__(self, memo):
         """This functions is not permitted due to the class only keeping a handle, that is managed by the cuvis sdk."""
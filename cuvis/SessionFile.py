@@ -2,31 +2,37 @@
 from pathlib import Path
 
 from ._cuvis_il import cuvis_il
-from .Measurement import Measurement, ImageData
+from . import handles
+from .Measurement import Measurement, ImageData, _key_patterns
 from .cuvis_aux import SDKException
 from .cuvis_types import OperationMode, SessionItemType, ReferenceType, CUVIS_imbuffer_format
 
 import cuvis.cuvis_types as internal
 
-from typing import Union, Optional
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, Union, Optional
 
 
-class SessionFile(object):
+class SessionFile(handles.HandleOwner):
     def __init__(self, base: Union[Path, str]):
         base = Path(base)
         self._handle = None
         self._pc = None
+        self._thumbnail = None
         if base.exists():
             _ptr = cuvis_il.new_p_int()
             if cuvis_il.status_ok != cuvis_il.cuvis_session_file_load(str(base),
                                                                       _ptr):
                 raise SDKException()
             self._handle = cuvis_il.p_int_value(_ptr)
+            handles._register(self)
         else:
             raise FileNotFoundError(
                 "Could not open SessionFile File! File not found!")
 
-    def get_measurement(self, frameNo: int = 0, itemtype: SessionItemType = SessionItemType.no_gaps) -> Optional[Measurement]:
+    def get_measurement(self, frameNo: int = 0, itemtype: SessionItemType = SessionItemType.no_gaps,
+                        keys: Optional[Iterable[str]] = None) -> Optional[Measurement]:
         _ptr = cuvis_il.new_p_int()
         ret = cuvis_il.cuvis_session_file_get_mesu(self._handle, frameNo, internal.__CuvisSessionItemType__[itemtype],
                                                    _ptr)
@@ -34,7 +40,7 @@ class SessionFile(object):
             return None
         if cuvis_il.status_ok != ret:
             raise SDKException()
-        mesu = Measurement(cuvis_il.p_int_value(_ptr))
+        mesu = Measurement(cuvis_il.p_int_value(_ptr), keys=keys)
         mesu._session = self
         return mesu
 
@@ -51,15 +57,26 @@ class SessionFile(object):
 
     @property
     def thumbnail(self) -> ImageData:
-        thumbnail_data = cuvis_il.cuvis_view_data_t()
-        if cuvis_il.status_ok != cuvis_il.cuvis_session_file_get_thumbnail(self, thumbnail_data):
-            raise SDKException()
+        if self._thumbnail is None:
+            thumbnail_data = cuvis_il.cuvis_view_data_t()
+            if cuvis_il.status_ok != cuvis_il.cuvis_session_file_get_thumbnail(self._handle, thumbnail_data):
+                raise SDKException()
 
-        if thumbnail_data.data.format == CUVIS_imbuffer_format["imbuffer_format_uint8"]:
-            return ImageData(img_buf=thumbnail_data.data,
-                             dformat=thumbnail_data.data.format)
-        else:
-            raise SDKException("Unsupported viewer bit depth!")
+            if thumbnail_data.data.format == CUVIS_imbuffer_format["imbuffer_format_uint8"]:
+                self._thumbnail = ImageData(img_buf=thumbnail_data.data,
+                                            dformat=thumbnail_data.data.format)
+            else:
+                raise SDKException("Unsupported viewer bit depth!")
+        return self._thumbnail
+
+    def get_thumbnail(self, size: Optional[Union[int, tuple[int, int]]] = None) -> ImageData:
+        """
+        Returns the session thumbnail, downsampled through its cached image
+        pyramid to the coarsest level that is still at least `size` large.
+        """
+        if size is None:
+            return self.thumbnail
+        return self.thumbnail.preview(size)
 
     def get_size(self, itemtype: SessionItemType = SessionItemType.no_gaps) -> int:
         val = cuvis_il.new_p_int()
@@ -88,6 +105,68 @@ class SessionFile(object):
     def hash(self) -> str:
         return cuvis_il.cuvis_session_file_get_hash_swig(self._handle)
 
+    def iter(self, prefetch: int = 2, workers: int = 1,
+             item_type: SessionItemType = SessionItemType.no_gaps,
+             keys: Optional[Iterable[str]] = None,
+             release: bool = True) -> Iterator[Measurement]:
+        """
+        Iterates over the measurements in order, loading up to `prefetch`
+        upcoming frames on `workers` background threads while the current
+        one is processed. The selected data items (`keys`, see Measurement)
+        are fetched in the background as well.
+
+        With `release`, a frame is closed as soon as the next one is
+        requested, so memory stays bounded, and its images are cleared;
+        keep data beyond that by detaching it, e.g. with
+        `mesu.release(keep=["cube"])` or `mesu.cube.detach()`.
+
+        Example:
+            for mesu in session.iter(prefetch=4, workers=2, keys={"cube"}):
+                analyze(mesu.cube.array)
+        """
+        keys = _key_patterns(keys)
+        count = self.get_size(item_type)
+
+        def _load(frame: int) -> Optional[Measurement]:
+            mesu = self.get_measurement(frame, item_type, keys=keys)
+            if mesu is not None:
+                for key in mesu.data.keys():
+                    mesu.data[key]
+            return mesu
+
+        pool = ThreadPoolExecutor(max_workers=max(workers, 1))
+        pending = deque()
+        current = None
+        try:
+            for frame in range(count):
+                pending.append(pool.submit(_load, frame))
+                if len(pending) <= prefetch:
+                    continue
+                current = self._advance(current, pending.popleft(), release)
+                if current is not None:
+                    yield current
+            while pending:
+                current = self._advance(current, pending.popleft(), release)
+                if current is not None:
+                    yield current
+            if release and current is not None:
+                current.close()
+        finally:
+            for future in pending:
+                future.cancel()
+            pool.shutdown(wait=True)
+            if release:
+                for future in pending:
+                    if not future.cancelled() and future.exception() is None \
+                            and future.result() is not None:
+                        future.result().close()
+
+    @staticmethod
+    def _advance(current: Optional[Measurement], future, release: bool) -> Optional[Measurement]:
+        if release and current is not None:
+            current.close()
+        return future.result()
+
     # Python Magic Methods
     def __iter__(self):
         for i in range(len(self)):
@@ -100,11 +179,16 @@ class SessionFile(object):
     def __getitem__(self, key: int) -> Measurement:
         return self.get_measurement(key)
 
-    def __del__(self):
+    def _free(self, handle: int) -> None:
+        # the thumbnail views session memory, the processing context
+        # was created from this session
+        self._thumbnail = None
+        if self._pc is not None:
+            self._pc.close()
+            self._pc = None
         _ptr = cuvis_il.new_p_int()
-        cuvis_il.p_int_assign(_ptr, self._handle)
+        cuvis_il.p_int_assign(_ptr, handle)
         cuvis_il.cuvis_session_file_free(_ptr)
-        self._handle = cuvis_il.p_int_value(_ptr)
 
     def __deepcopy__(self, memo):
         '''This functions is not permitted due to the class only keeping a handle, that is managed by the cuvis sdk.'''
@@ -1,4 +1,5 @@
 from ._cuvis_il import cuvis_il
+from . import handles
 from .Measurement import ImageData, Measurement
 from .cuvis_aux import SDKException
 from .cuvis_types import CUVIS_imbuffer_format
@@ -8,7 +9,7 @@ from .FileWriteSettings import ViewerSettings
 from typing import Union
 
 
-class Viewer(object):
+class Viewer(handles.HandleOwner):
     def __init__(self, settings: Union[int, ViewerSettings]):
         self._handle = None
         if isinstance(settings, int):
@@ -23,7 +24,7 @@ class Viewer(object):
             raise SDKException(
                 "Could not open ViewerSettings of type {}!".format(
                     type(settings)))
-        pass
+        handles._register(self)
 
     def _create_view_data(self, new_handle: int) -> Union[dict[str, ImageData], ImageData]:
 
@@ -60,11 +61,10 @@ class Viewer(object):
 
         return self._create_view_data(currentView)
 
-    def __del__(self):
+    def _free(self, handle: int) -> None:
         _ptr = cuvis_il.new_p_int()
-        cuvis_il.p_int_assign(_ptr, self._handle)
+        cuvis_il.p_int_assign(_ptr, handle)
         cuvis_il.cuvis_viewer_free(_ptr)
-        self._handle = cuvis_il.p_int_value(_ptr)
 
     def __deepcopy__(self, memo):
         '''This functions is not permitted due to the class only keeping a handle, that is managed by the cuvis sdk.'''
@@ -1,4 +1,5 @@
 from ._cuvis_il import cuvis_il
+from . import handles
 from .Measurement import Measurement
 from .Viewer import Viewer, ImageData
 from .cuvis_aux import SDKException, WorkerState
@@ -22,7 +23,7 @@ class WorkerResult:
     view: ImageData
 
 
-class Worker(object):
+class Worker(handles.HandleOwner):
     def __init__(self, args: WorkerSettings):
         self._exporter_set = False
         self._acquisition_set = False
@@ -38,6 +39,7 @@ class Worker(object):
         if cuvis_il.status_ok != cuvis_il.cuvis_worker_create(_ptr, settings):
             raise SDKException()
         self._handle = cuvis_il.p_int_value(_ptr)
+        handles._register(self)
         pass
 
     @copydoc(cuvis_il.cuvis_worker_set_acq_cont)
@@ -311,12 +313,11 @@ class Worker(object):
             self._worker_poll_task.cancel()
             self._worker_poll_task = None
 
-    def __del__(self):
+    def _free(self, handle: int) -> None:
         self.reset_worker_callback()
         _ptr = cuvis_il.new_p_int()
-        cuvis_il.p_int_assign(_ptr, self._handle)
+        cuvis_il.p_int_assign(_ptr, handle)
         cuvis_il.cuvis_worker_free(_ptr)
-        self._handle = cuvis_il.p_int_value(_ptr)
 
     def __deepcopy__(self, memo):
         '''This functions is not permitted due to the class only keeping a handle, that is managed by the cuvis sdk.'''
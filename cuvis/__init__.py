@@ -18,12 +18,15 @@ from .cuvis_types import (
     ReferenceType,
     SessionItemType,
     SessionMergeMode,
+    ResamplingMethod,
+    SpectralMetric,
+    Interleave,
 )
 from .Worker import Worker, WorkerResult
 from .Viewer import Viewer
 from .SessionFile import SessionFile
 from .ProcessingContext import ProcessingContext
-from .Measurement import Measurement
+from .Measurement import Measurement, MeasurementMetadata
 from .General import init, shutdown, version, set_log_level
 from .FileWriteSettings import (
     GeneralExportSettings,
@@ -38,7 +41,17 @@ from .FileWriteSettings import (
 from .Export import CubeExporter, EnviExporter, TiffExporter, ViewExporter
 from .Calibration import Calibration
 from .AcquisitionContext import AcquisitionContext
-from .cube_utils import ImageData
+from .cube_utils import ImageData, BufferPool, ROISpectra, SharedImage, Tile, write_tiles
+from .resampling import SpectralResampler
+from .spectral_matching import SpectralLibrary, SpectralMatcher, MatchResult
+from .band_statistics import BandStatistics, BandStatisticsResult
+from .decomposition import PCA, MNF
+from .reflectance import ReflectanceCorrector
+from .bad_pixels import BadPixelMap, BadPixelStore
+from .band_math import BandMathPlan, compile_band_math, evaluate_band_math
+from .loading import LoadResult, load_many
+from .handles import LiveHandle, enable_handle_tracking, live_handles
+from .dedup import Deduplicator
 import os
 import platform
 import sys
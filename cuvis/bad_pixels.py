@@ -0,0 +1,249 @@
+from .cube_utils import ImageData, BufferPool
+
+import numpy as np
+
+from pathlib import Path
+from typing import Iterable, Optional, Union
+
+# robust sigma of a normal distribution from the median absolute deviation
+_MAD_TO_SIGMA = 1.4826
+
+
+def _frame_array(item) -> np.ndarray:
+    if not isinstance(item, (ImageData, np.ndarray)):
+        item = item.cube
+    if isinstance(item, ImageData):
+        item = item.array
+    return np.asarray(item)
+
+
+class _PixelMoments(object):
+    """Per-pixel temporal mean and variance of the band-averaged signal."""
+
+    def __init__(self):
+        self.count = 0
+        self.sum = None
+        self.sum_sq = None
+
+    def update(self, frame: np.ndarray) -> None:
+        plane = frame.mean(axis=2, dtype=np.float64) if frame.ndim == 3 else frame.astype(np.float64)
+        if self.sum is None:
+            self.sum = np.zeros_like(plane)
+            self.sum_sq = np.zeros_like(plane)
+        elif plane.shape != self.sum.shape:
+            raise ValueError("Frame of shape {} does not match {}.".format(plane.shape, self.sum.shape))
+        self.sum += plane
+        self.sum_sq += plane * plane
+        self.count += 1
+
+    @property
+    def mean(self) -> np.ndarray:
+        return self.sum / self.count
+
+    @property
+    def std(self) -> np.ndarray:
+        return np.sqrt(np.maximum(self.sum_sq / self.count - self.mean ** 2, 0.0))
+
+
+def _outliers(values: np.ndarray, sigma: float, min_deviation: float) -> np.ndarray:
+    median = np.median(values)
+    # quantized frames often have a MAD of zero, the floor keeps single
+    # counts of noise from being flagged
+    mad = max(np.median(np.abs(values - median)) * _MAD_TO_SIGMA, min_deviation)
+    return np.abs(values - median) > sigma * mad
+
+
+class BadPixelMap(object):
+    """
+    A spatial mask of defective pixels and the tables to repair them.
+
+    For every bad pixel, the good pixels of the smallest surrounding square
+    window (up to `max_radius`) are precomputed as a gather table, so
+    correcting a cube is one fancy-index and one weighted sum for all bad
+    pixels and bands at once.
+
+    Example:
+        bpm = BadPixelMap.from_references(darks, flats, calibration.id)
+        BadPixelStore("~/.cuvis/bad_pixels").put(bpm)
+        fixed = bpm.apply(mesu.cube)
+    """
+
+    def __init__(self, mask: np.ndarray, calibration_id: Optional[str] = None, max_radius: int = 3):
+        self._mask = np.asarray(mask, dtype=bool)
+        if self._mask.ndim != 2:
+            raise ValueError("Bad pixel mask has to be two-dimensional.")
+        self._mask.flags.writeable = False
+        self._calibration_id = calibration_id
+        self._max_radius = max_radius
+        self._targets, self._sources, self._weights = self._build_tables()
+        # 2-D coordinates, so that non-contiguous cubes can be repaired in place
+        width = self._mask.shape[1]
+        self._target_yx = np.divmod(self._targets, width)
+        self._source_yx = np.divmod(self._sources, width)
+
+    @property
+    def mask(self) -> np.ndarray:
+        return self._mask
+
+    @property
+    def calibration_id(self) -> Optional[str]:
+        return self._calibration_id
+
+    @property
+    def count(self) -> int:
+        return len(self._targets)
+
+    def _build_tables(self):
+        height, width = self._mask.shape
+        bad_y, bad_x = np.nonzero(self._mask)
+        targets = bad_y * width + bad_x
+        if len(targets) == 0:
+            return targets, np.zeros((0, 1), dtype=np.intp), np.zeros((0, 1))
+
+        good = ~self._mask
+        width_k = 2 * self._max_radius + 1
+        sources = np.zeros((len(targets), width_k * width_k), dtype=np.intp)
+        weights = np.zeros((len(targets), width_k * width_k))
+        unresolved = np.ones(len(targets), dtype=bool)
+        for radius in range(1, self._max_radius + 1):
+            dy, dx = np.mgrid[-radius:radius + 1, -radius:radius + 1]
+            dy, dx = dy.ravel(), dx.ravel()
+            idx = np.flatnonzero(unresolved)
+            ny = bad_y[idx, None] + dy[None, :]
+            nx = bad_x[idx, None] + dx[None, :]
+            inside = (ny >= 0) & (ny < height) & (nx >= 0) & (nx < width)
+            ny, nx = np.clip(ny, 0, height - 1), np.clip(nx, 0, width - 1)
+            usable = inside & good[ny, nx]
+            found = usable.sum(axis=1)
+            resolved = found > 0
+            rows = idx[resolved]
+            sources[rows, :len(dy)] = (ny * width + nx)[resolved]
+            weights[rows, :len(dy)] = usable[resolved] / found[resolved, None]
+            unresolved[rows] = False
+            if not unresolved.any():
+                break
+        if unresolved.any():
+            # no good neighbour within reach, leave these pixels untouched
+            sources[unresolved, 0] = targets[unresolved]
+            weights[unresolved, 0] = 1.0
+        used = max(int((weights > 0).sum(axis=1).max()), 1)
+        order = np.argsort(weights <= 0, axis=1, kind="stable")[:, :used]
+        return targets, np.take_along_axis(sources, order, axis=1), \
+            np.take_along_axis(weights, order, axis=1)
+
+    def apply(self, cube: Union[ImageData, np.ndarray], out: Optional[np.ndarray] = None,
+              pool: Optional[BufferPool] = None, in_place: bool = False):
+        """
+        Replaces bad pixels by the mean of their good neighbours in every band.
+
+        The corrected cube is written to `out`, to an array acquired from
+        `pool`, back into the input if `in_place` is set, or to a new array.
+        ImageData inputs return ImageData, arrays return arrays.
+        """
+        array = cube.array if isinstance(cube, ImageData) else np.asarray(cube)
+        if array.shape[:2] != self._mask.shape:
+            raise ValueError("Cube of shape {} does not match the bad pixel mask {}.".format(
+                array.shape[:2], self._mask.shape))
+        if in_place:
+            out = array
+        else:
+            if out is None:
+                out = pool.acquire(array.shape, array.dtype) if pool is not None \
+                    else np.empty_like(array)
+            np.copyto(out, array)
+        if len(self._targets):
+            planes = out if out.ndim == 3 else out[:, :, np.newaxis]
+            gathered = planes[self._source_yx]
+            repaired = np.einsum("nk,nkc->nc", self._weights, gathered)
+            if np.issubdtype(planes.dtype, np.integer):
+                repaired = np.rint(repaired)
+            planes[self._target_yx] = repaired.astype(planes.dtype, copy=False)
+        if isinstance(cube, ImageData):
+            if out is array:
+                return cube
+            return ImageData.from_array(out, width=cube.width, height=cube.height,
+                                        channels=cube.channels, wavelength=cube.wavelength)
+        return out
+
+    @classmethod
+    def from_references(cls, darks: Iterable = (), flats: Iterable = (),
+                        calibration_id: Optional[str] = None, sigma: float = 6.0,
+                        max_radius: int = 3, min_deviation: float = 1.0) -> "BadPixelMap":
+        """
+        Detects bad pixels from dark and flat (white) frames.
+
+        Accepts Measurements, ImageData or arrays. Flags hot pixels (dark
+        level outlier), dead or weak pixels (flat response outlier) and, with
+        at least two flat frames, stuck pixels (no temporal variation while
+        their neighbours vary). Outliers are judged against a robust sigma
+        estimated from the median absolute deviation, but at least
+        `min_deviation` (one count by default, lower it for frames that are
+        not in raw counts).
+        """
+        dark, flat = _PixelMoments(), _PixelMoments()
+        for item in darks:
+            dark.update(_frame_array(item))
+        for item in flats:
+            flat.update(_frame_array(item))
+        if dark.count == 0 and flat.count == 0:
+            raise ValueError("At least one dark or flat frame is required.")
+
+        mask = None
+        if dark.count:
+            mask = _outliers(dark.mean, sigma, min_deviation)
+        if flat.count:
+            response = flat.mean - (dark.mean if dark.count else 0.0)
+            flat_mask = _outliers(response, sigma, min_deviation)
+            if flat.count > 1:
+                noise = flat.std
+                flat_mask |= noise <= 1e-3 * max(float(np.median(noise)), np.finfo(np.float64).tiny)
+            mask = flat_mask if mask is None else mask | flat_mask
+        return cls(mask, calibration_id, max_radius)
+
+    def save(self, path: Union[str, Path]) -> None:
+        np.savez_compressed(Path(path), mask=self._mask,
+                            calibration_id=np.array(self._calibration_id or ""),
+                            max_radius=np.array(self._max_radius))
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "BadPixelMap":
+        with np.load(Path(path)) as data:
+            calibration_id = str(data["calibration_id"]) or None
+            return cls(data["mask"], calibration_id, int(data["max_radius"]))
+
+
+class BadPixelStore(object):
+    """
+    Persists bad pixel maps in a directory, one file per calibration id.
+    Loaded maps are kept in memory.
+    """
+
+    def __init__(self, directory: Union[str, Path]):
+        self._directory = Path(directory).expanduser()
+        self._loaded = {}
+
+    def _file(self, calibration_id: str) -> Path:
+        safe = "".join(c if c.isalnum() or c in "-_." else "_" for c in calibration_id)
+        return self._directory / "{}.npz".format(safe)
+
+    def put(self, bad_pixels: BadPixelMap) -> None:
+        if not bad_pixels.calibration_id:
+            raise ValueError("Bad pixel map has no calibration id.")
+        self._directory.mkdir(parents=True, exist_ok=True)
+        bad_pixels.save(self._file(bad_pixels.calibration_id))
+        self._loaded[bad_pixels.calibration_id] = bad_pixels
+
+    def get(self, calibration_id: str) -> Optional[BadPixelMap]:
+        if calibration_id not in self._loaded:
+            path = self._file(calibration_id)
+            if not path.exists():
+                return None
+            self._loaded[calibration_id] = BadPixelMap.load(path)
+        return self._loaded[calibration_id]
+
+    def for_measurement(self, mesu) -> Optional[BadPixelMap]:
+        """Returns the map stored for the calibration the measurement was recorded with."""
+        return self.get(mesu.calibration_id)
+
+    def __contains__(self, calibration_id: str) -> bool:
+        return self.get(calibration_id) is not None
@@ -0,0 +1,217 @@
+from .cube_utils import ImageData, _nearest_sorted
+
+import ast
+import functools
+import re
+import numpy as np
+
+from dataclasses import dataclass
+from typing import Mapping, Optional, Union
+
+# band references are written as b<nm>, e.g. b800 or b532_5 for 532.5 nm
+_BAND_PATTERN = re.compile(r"^b(\d+(?:_\d+)?)$")
+
+_BINARY_OPS = {
+    ast.Add: np.add,
+    ast.Sub: np.subtract,
+    ast.Mult: np.multiply,
+    ast.Div: np.true_divide,
+    ast.Pow: np.power,
+}
+
+_UNARY_OPS = {
+    ast.USub: np.negative,
+    ast.UAdd: np.positive,
+}
+
+_FUNCTIONS = {
+    "abs": np.absolute,
+    "sqrt": np.sqrt,
+    "log": np.log,
+    "exp": np.exp,
+    "minimum": np.minimum,
+    "maximum": np.maximum,
+}
+
+
+@dataclass(frozen=True)
+class _Operand(object):
+    kind: str  # "band", "const" or "reg"
+    value: Union[int, float]
+
+
+class _Compiler(object):
+    """
+    Translates one expression into a register program.
+    Band loads are collected in a table shared between expressions.
+    """
+
+    def __init__(self, sorted_wl: np.ndarray, order: np.ndarray,
+                 tolerance: Optional[float], band_slots: dict):
+        self._sorted_wl = sorted_wl
+        self._order = order
+        self._tolerance = tolerance
+        self._band_slots = band_slots
+        self._free = []
+        self._n_regs = 0
+        self.instructions = []
+
+    def compile(self, expression: str):
+        try:
+            tree = ast.parse(expression, mode="eval")
+        except SyntaxError as e:
+            raise ValueError("Invalid band math expression '{}': {}".format(expression, e.msg))
+        result = self._visit(tree.body)
+        if result.kind != "reg":
+            # materialize constants and plain band references in a register
+            dst = self._alloc()
+            self.instructions.append((np.positive, (result,), dst))
+            result = _Operand("reg", dst)
+        return tuple(self.instructions), result.value, self._n_regs
+
+    def _alloc(self) -> int:
+        if self._free:
+            return self._free.pop()
+        self._n_regs += 1
+        return self._n_regs - 1
+
+    def _release(self, operand: _Operand) -> None:
+        if operand.kind == "reg":
+            self._free.append(operand.value)
+
+    def _emit(self, ufunc, args: tuple) -> _Operand:
+        if all(a.kind == "const" for a in args):
+            return _Operand("const", float(ufunc(*[a.value for a in args])))
+        regs = [a for a in args if a.kind == "reg"]
+        dst = regs[0].value if regs else self._alloc()
+        for a in regs[1:]:
+            self._release(a)
+        self.instructions.append((ufunc, args, dst))
+        return _Operand("reg", dst)
+
+    def _band(self, name: str) -> _Operand:
+        nm = float(_BAND_PATTERN.match(name).group(1).replace("_", "."))
+        pos = int(_nearest_sorted(self._sorted_wl, nm))
+        if self._tolerance is not None and abs(self._sorted_wl[pos] - nm) > self._tolerance:
+            raise ValueError("No band within {} nm of {} nm.".format(self._tolerance, nm))
+        band = int(self._order[pos])
+        slot = self._band_slots.setdefault(band, len(self._band_slots))
+        return _Operand("band", slot)
+
+    def _visit(self, node) -> _Operand:
+        if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPS:
+            return self._emit(_BINARY_OPS[type(node.op)],
+                              (self._visit(node.left), self._visit(node.right)))
+        if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPS:
+            return self._emit(_UNARY_OPS[type(node.op)], (self._visit(node.operand),))
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) \
+                and node.func.id in _FUNCTIONS and not node.keywords:
+            ufunc = _FUNCTIONS[node.func.id]
+            if len(node.args) != ufunc.nin:
+                raise ValueError("'{}' takes {} argument(s).".format(node.func.id, ufunc.nin))
+            return self._emit(ufunc, tuple(self._visit(a) for a in node.args))
+        if isinstance(node, ast.Name) and _BAND_PATTERN.match(node.id):
+            return self._band(node.id)
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+            return _Operand("const", float(node.value))
+        raise ValueError("Unsupported element in band math expression: '{}'".format(
+            ast.dump(node)))
+
+
+@dataclass(frozen=True)
+class BandMathPlan(object):
+    """
+    A set of compiled band math expressions for one wavelength grid.
+
+    `bands` lists the cube bands that are loaded once and shared by all
+    expressions, `programs` holds one register program per expression.
+    """
+    names: tuple[str, ...]
+    bands: tuple[int, ...]
+    programs: tuple
+
+    def evaluate(self, array: np.ndarray, out: Optional[Mapping[str, np.ndarray]] = None,
+                 dtype=np.float32) -> dict[str, np.ndarray]:
+        """
+        Evaluates all expressions on a (height, width, channels) array.
+
+        Results are written to the arrays in `out` where given, otherwise
+        new arrays are allocated. Scratch buffers are shared between
+        expressions.
+        """
+        dtype = np.dtype(dtype)
+        shape = array.shape[:2]
+        loaded = []
+        for band in self.bands:
+            plane = array[:, :, band]
+            loaded.append(plane if plane.dtype == dtype else plane.astype(dtype))
+        n_scratch = max((n for _, _, n in self.programs), default=0)
+        scratch = [np.empty(shape, dtype=dtype) for _ in range(n_scratch)]
+
+        results = {}
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for name, (instructions, result_reg, n_regs) in zip(self.names, self.programs):
+                target = None if out is None else out.get(name)
+                if target is None:
+                    target = np.empty(shape, dtype=dtype)
+                registers = list(scratch[:n_regs])
+                registers[result_reg] = target
+                for ufunc, args, dst in instructions:
+                    operands = [loaded[a.value] if a.kind == "band"
+                                else registers[a.value] if a.kind == "reg"
+                                else a.value for a in args]
+                    ufunc(*operands, out=registers[dst])
+                results[name] = target
+        return results
+
+
+@functools.lru_cache(maxsize=128)
+def _compile_cached(expressions: tuple, wavelength: tuple,
+                    tolerance: Optional[float]) -> BandMathPlan:
+    wl = np.asarray(wavelength, dtype=np.float64)
+    order = np.argsort(wl, kind="stable")
+    band_slots = {}
+    programs = []
+    for _, expression in expressions:
+        programs.append(_Compiler(wl[order], order, tolerance, band_slots).compile(expression))
+    bands = tuple(band for band, _ in sorted(band_slots.items(), key=lambda kv: kv[1]))
+    return BandMathPlan(names=tuple(name for name, _ in expressions),
+                        bands=bands, programs=tuple(programs))
+
+
+def compile_band_math(expressions: Union[str, Mapping[str, str]], wavelength,
+                      tolerance: Optional[float] = None) -> BandMathPlan:
+    """
+    Compiles one or several band math expressions for a wavelength grid.
+
+    Band references (`b800`, `b532_5`) resolve to the nearest band, or raise
+    a ValueError if none lies within `tolerance` nanometers. Supported are
+    + - * / **, unary minus and abs, sqrt, log, exp, minimum, maximum.
+    Plans are cached per (expressions, wavelength grid, tolerance).
+    """
+    if wavelength is None:
+        raise ValueError("Wavelength data is not available.")
+    if isinstance(expressions, str):
+        expressions = {expressions: expressions}
+    return _compile_cached(tuple(expressions.items()),
+                           tuple(float(w) for w in wavelength), tolerance)
+
+
+def evaluate_band_math(cube: ImageData, expressions: Union[str, Mapping[str, str]],
+                       out=None, tolerance: Optional[float] = None, dtype=np.float32):
+    """
+    Evaluates band math expressions on a cube.
+
+    Example:
+        ndvi = evaluate_band_math(cube, "(b800 - b670) / (b800 + b670)")
+        indices = evaluate_band_math(cube, {"ndvi": "(b800 - b670) / (b800 + b670)",
+                                            "ratio": "b800 / b670"})
+
+    A single expression returns an array (written to `out` if given), a
+    mapping of expressions returns a dict of arrays keyed by name.
+    """
+    plan = compile_band_math(expressions, cube.wavelength, tolerance)
+    if isinstance(expressions, str):
+        result = plan.evaluate(cube.array, None if out is None else {expressions: out}, dtype)
+        return result[expressions]
+    return plan.evaluate(cube.array, out, dtype)
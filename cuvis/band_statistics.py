@@ -0,0 +1,154 @@
+from .cube_utils import ImageData
+
+import numpy as np
+
+from dataclasses import dataclass
+from typing import Iterable, Optional, Union
+
+# number of pixels reduced at once, bounds the float64 working set
+_CHUNK_PIXELS = 1 << 16
+
+
+@dataclass(frozen=True)
+class BandStatisticsResult(object):
+    count: int
+    mean: np.ndarray
+    variance: np.ndarray
+    std: np.ndarray
+    min: np.ndarray
+    max: np.ndarray
+    covariance: Optional[np.ndarray]
+    wavelength: Optional[np.ndarray]
+
+    def __repr__(self):
+        return "'BandStatistics: {} pixels, {} bands'".format(self.count, len(self.mean))
+
+
+class BandStatistics(object):
+    """
+    Streaming per-band statistics over any number of cubes.
+
+    Keeps count, mean, the sum of squared deviations (and optionally the
+    co-moment matrix), minimum and maximum per band in float64. Cubes are
+    reduced in chunks and combined with the parallel update of Chan et al.,
+    so only one cube has to be held at a time. Accumulators from different
+    processes can be combined with `merge`.
+
+    Example:
+        stats = BandStatistics()
+        stats.consume(SessionFile("recording.cu3s"))
+        result = stats.finalize()
+    """
+
+    def __init__(self, covariance: bool = False):
+        self._with_covariance = covariance
+        self._count = 0
+        self._mean = None
+        self._m2 = None
+        self._comoment = None
+        self._min = None
+        self._max = None
+        self._wavelength = None
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    def _check_bands(self, channels: int, wavelength) -> None:
+        if self._mean is None:
+            self._mean = np.zeros(channels)
+            self._m2 = np.zeros(channels)
+            self._min = np.full(channels, np.inf)
+            self._max = np.full(channels, -np.inf)
+            if self._with_covariance:
+                self._comoment = np.zeros((channels, channels))
+            if wavelength is not None:
+                self._wavelength = np.asarray(wavelength)
+        elif len(self._mean) != channels:
+            raise ValueError("Expected {} bands, got {}.".format(len(self._mean), channels))
+        elif wavelength is not None and self._wavelength is not None \
+                and not np.array_equal(wavelength, self._wavelength):
+            raise ValueError("Wavelength grid differs from the accumulated data.")
+
+    def _combine(self, count, mean, m2, comoment, minimum, maximum) -> None:
+        total = self._count + count
+        delta = mean - self._mean
+        self._mean += delta * (count / total)
+        self._m2 += m2 + delta ** 2 * (self._count * count / total)
+        if self._comoment is not None:
+            self._comoment += comoment + np.outer(delta, delta) * (self._count * count / total)
+        np.minimum(self._min, minimum, out=self._min)
+        np.maximum(self._max, maximum, out=self._max)
+        self._count = total
+
+    def update(self, cube: Union[ImageData, np.ndarray], mask: Optional[np.ndarray] = None) -> None:
+        """
+        Adds all pixels of a cube, or only those where `mask` is True.
+        """
+        wavelength = None
+        if isinstance(cube, ImageData):
+            wavelength = cube.wavelength
+            cube = cube.array
+        if cube is None:
+            raise ValueError("Image array is not initialized.")
+        channels = cube.shape[-1]
+        pixels = cube.reshape(-1, channels)
+        if mask is not None:
+            pixels = pixels[np.asarray(mask, dtype=bool).reshape(-1)]
+        self._check_bands(channels, wavelength)
+
+        for start in range(0, len(pixels), _CHUNK_PIXELS):
+            chunk = pixels[start:start + _CHUNK_PIXELS]
+            minimum, maximum = chunk.min(axis=0), chunk.max(axis=0)
+            chunk = chunk.astype(np.float64)
+            mean = chunk.mean(axis=0)
+            chunk -= mean
+            m2 = np.einsum("ij,ij->j", chunk, chunk)
+            comoment = chunk.T @ chunk if self._comoment is not None else None
+            self._combine(len(chunk), mean, m2, comoment, minimum, maximum)
+
+    def consume(self, items: Iterable, mask: Optional[np.ndarray] = None) -> "BandStatistics":
+        """
+        Updates from an iterable of ImageData or Measurements, e.g. a SessionFile.
+        Measurements contribute their cube.
+        """
+        for item in items:
+            cube = item if isinstance(item, (ImageData, np.ndarray)) else item.cube
+            self.update(cube, mask)
+            del item, cube
+        return self
+
+    def merge(self, other: "BandStatistics") -> "BandStatistics":
+        """
+        Combines the statistics of another accumulator into this one.
+        """
+        if other._count == 0:
+            return self
+        if self._with_covariance and other._comoment is None:
+            raise ValueError("Cannot merge an accumulator without covariance.")
+        self._check_bands(len(other._mean), other._wavelength)
+        self._combine(other._count, other._mean, other._m2,
+                      other._comoment if self._comoment is not None else None,
+                      other._min, other._max)
+        return self
+
+    def finalize(self, ddof: int = 0) -> BandStatisticsResult:
+        """
+        Returns the statistics gathered so far. `ddof` is the delta degrees
+        of freedom for variance and covariance (1 for the sample estimate).
+        """
+        if self._count == 0:
+            raise ValueError("No data has been accumulated.")
+        denominator = max(self._count - ddof, 1)
+        variance = self._m2 / denominator
+        covariance = None
+        if self._comoment is not None:
+            covariance = self._comoment / denominator
+        return BandStatisticsResult(count=self._count,
+                                    mean=self._mean.copy(),
+                                    variance=variance,
+                                    std=np.sqrt(variance),
+                                    min=self._min.copy(),
+                                    max=self._max.copy(),
+                                    covariance=covariance,
+                                    wavelength=self._wavelength)
@@ -1,11 +1,403 @@
-from typing import Union
+from typing import Callable, Iterable, Iterator, Optional, Union
 from ._cuvis_il import cuvis_il
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+import ctypes
+import hashlib
+import struct
+import sys
+import threading
+import weakref
 import numpy as np
 from .cuvis_aux import SDKException
+from .cuvis_types import Interleave
+from multiprocessing import shared_memory
+from pathlib import Path
+
+
+_wavelength_cache = weakref.WeakValueDictionary()
+_wavelength_cache_lock = threading.Lock()
+
+
+def _intern_wavelength(wavelength) -> Optional[np.ndarray]:
+    """
+    Returns a read-only wavelength array, shared with every other ImageData
+    that carries an identical wavelength grid.
+    """
+    if wavelength is None:
+        return None
+    wl = np.ascontiguousarray(wavelength)
+    if wl.ndim != 1:
+        raise ValueError("Wavelength data must be one-dimensional.")
+    key = (wl.dtype.str, wl.tobytes())
+    with _wavelength_cache_lock:
+        cached = _wavelength_cache.get(key)
+        if cached is None:
+            cached = wl.copy()
+            cached.flags.writeable = False
+            _wavelength_cache[key] = cached
+    return cached
+
+
+def _as_slice(indices: np.ndarray) -> Optional[slice]:
+    """
+    Expresses an index array as an equivalent slice, if it is evenly spaced.
+    """
+    if len(indices) == 0:
+        return slice(0, 0)
+    if len(indices) == 1:
+        return slice(int(indices[0]), int(indices[0]) + 1)
+    steps = np.diff(indices)
+    step = int(steps[0])
+    if step <= 0 or np.any(steps != step):
+        return None
+    return slice(int(indices[0]), int(indices[-1]) + 1, step)
+
+
+def _nearest_sorted(sorted_values: np.ndarray, query) -> np.ndarray:
+    """
+    Returns the positions of the entries in `sorted_values` closest to `query`.
+    Ties resolve to the lower value.
+    """
+    query = np.asarray(query, dtype=np.float64)
+    if len(sorted_values) == 1:
+        return np.zeros(query.shape, dtype=np.intp)
+    pos = np.clip(np.searchsorted(sorted_values, query), 1, len(sorted_values) - 1)
+    closer_left = np.abs(query - sorted_values[pos - 1]) <= np.abs(sorted_values[pos] - query)
+    return pos - closer_left
+
+
+def _index_axes(k) -> int:
+    """Number of array axes an entry of an index tuple consumes."""
+    if k is None or k is Ellipsis:
+        return 0
+    if isinstance(k, (bool, np.bool_)):
+        return 0
+    if isinstance(k, (np.ndarray, list)):
+        k = np.asarray(k)
+        if k.dtype == bool:
+            return k.ndim
+    return 1
+
+
+# axis order of each interleave relative to the native (rows, columns, bands) layout
+_INTERLEAVE_AXES = {
+    Interleave.BIP: (0, 1, 2),
+    Interleave.BIL: (0, 2, 1),
+    Interleave.BSQ: (2, 0, 1),
+}
+
+_ENVI_DATA_TYPES = {
+    np.dtype(np.uint8): 1,
+    np.dtype(np.int16): 2,
+    np.dtype(np.int32): 3,
+    np.dtype(np.float32): 4,
+    np.dtype(np.float64): 5,
+    np.dtype(np.uint16): 12,
+    np.dtype(np.uint32): 13,
+    np.dtype(np.int64): 14,
+    np.dtype(np.uint64): 15,
+}
+
+
+# pixels gathered per chunk in roi_spectra, bounds the float64 working set
+_ROI_CHUNK_PIXELS = 1 << 16
+
+
+def _tile_bounds(size: int, tile: int, overlap: int):
+    """
+    Yields (window start, window stop, core start, core stop) along one axis.
+    """
+    for start in range(0, size, tile):
+        stop = min(start + tile, size)
+        wstart = max(start - overlap, 0)
+        wstop = min(stop + overlap, size)
+        yield wstart, wstop, start - wstart, stop - wstart
+
+
+def _read_wavelength(img_buf, channels: int) -> np.ndarray:
+    """
+    Copies the wavelength vector of an image buffer in one go.
+    Falls back to element-wise access if the pointer address is not available.
+    """
+    try:
+        address = int(img_buf.wavelength)
+    except (TypeError, ValueError):
+        address = 0
+    if address:
+        raw = (ctypes.c_uint32 * channels).from_address(address)
+        return np.frombuffer(raw, dtype=np.uint32, count=channels)
+    return np.fromiter((cuvis_il.p_unsigned_int_getitem(img_buf.wavelength, z)
+                        for z in range(channels)),
+                       dtype=np.uint32, count=channels)
+
+
+@dataclass(frozen=True)
+class Tile(object):
+    """
+    A spatial window of an ImageData.
+
+    `image` is a view on the parent cube including the overlap margin,
+    `offset` is the (row, column) of the window's upper left corner in the
+    parent, and `core` selects the non-overlapping part within the window.
+    """
+    image: "ImageData"
+    offset: tuple[int, int]
+    core: tuple[slice, slice]
+
+    @property
+    def array(self) -> np.ndarray:
+        return self.image.array
+
+    @property
+    def wavelength(self) -> Optional[np.ndarray]:
+        return self.image.wavelength
+
+    @property
+    def target(self) -> tuple[slice, slice]:
+        """The region of the parent cube covered by `core`."""
+        y, x = self.offset
+        return (slice(y + self.core[0].start, y + self.core[0].stop),
+                slice(x + self.core[1].start, x + self.core[1].stop))
+
+
+def write_tiles(results: Iterable[tuple[Tile, np.ndarray]], out: np.ndarray) -> np.ndarray:
+    """
+    Assembles per-tile results into `out`.
+
+    Every result has to cover the full tile window (including the overlap);
+    only its core region is written, so overlapping margins never collide.
+    """
+    for tile, result in results:
+        result = np.asarray(result)
+        if result.shape[:2] != tile.array.shape[:2]:
+            raise ValueError("Tile result of shape {} does not match the tile window {}.".format(
+                result.shape[:2], tile.array.shape[:2]))
+        out[tile.target] = result[tile.core]
+    return out
+
+
+@dataclass(frozen=True)
+class ROISpectra(object):
+    """
+    Per-label spectra of an image: row i of `mean`, `std` and `count`
+    belongs to `labels[i]`.
+    """
+    labels: np.ndarray
+    mean: np.ndarray
+    std: np.ndarray
+    count: np.ndarray
+    wavelength: Optional[np.ndarray]
+
+    def __getitem__(self, label) -> tuple[np.ndarray, np.ndarray, int]:
+        """Returns mean, std and pixel count of a single label."""
+        idx = np.searchsorted(self.labels, label)
+        if idx >= len(self.labels) or self.labels[idx] != label:
+            raise KeyError(label)
+        return self.mean[idx], self.std[idx], int(self.count[idx])
+
+
+class BufferPool(object):
+    """
+    Recycles arrays of equal shape and dtype.
+
+    Frame-by-frame pipelines can acquire their output arrays from a pool and
+    give them back once a frame is done, instead of allocating a fresh cube
+    every frame.
+
+    Example:
+        pool = BufferPool()
+        refl = cube.astype(np.float32, scale=1 / 4096, pool=pool)
+        ...
+        pool.release(refl.array)
+    """
+
+    def __init__(self, max_per_key: int = 4):
+        self._max_per_key = max_per_key
+        self._free = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(shape, dtype) -> tuple:
+        return tuple(int(n) for n in shape), np.dtype(dtype).str
+
+    def acquire(self, shape, dtype) -> np.ndarray:
+        """
+        Returns an uninitialized array, reusing a released one if available.
+        """
+        key = self._key(shape, dtype)
+        with self._lock:
+            free = self._free.get(key)
+            if free:
+                return free.pop()
+        return np.empty(key[0], dtype=dtype)
+
+    def release(self, array: np.ndarray) -> None:
+        """
+        Hands an array back to the pool. It must not be used afterwards.
+        """
+        if array.base is not None or not array.flags.c_contiguous:
+            raise ValueError("Only arrays acquired from the pool can be released.")
+        key = self._key(array.shape, array.dtype)
+        with self._lock:
+            free = self._free.setdefault(key, [])
+            if len(free) < self._max_per_key:
+                free.append(array)
+
+    @contextmanager
+    def lease(self, shape, dtype) -> Iterator[np.ndarray]:
+        """
+        Context manager that acquires an array and releases it on exit.
+        """
+        array = self.acquire(shape, dtype)
+        try:
+            yield array
+        finally:
+            self.release(array)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._free.clear()
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(v) for v in self._free.values())
+
+
+class _BufferOwner(object):
+    """
+    Exposes an array that views SDK memory through the array interface while
+    holding on to the image buffer. Arrays created from it have this object
+    as their base, so every view derived from them keeps the buffer alive.
+    """
+    __slots__ = ("_array", "_img_buf", "__array_interface__")
+
+    def __init__(self, array: np.ndarray, img_buf):
+        self._array = array
+        self._img_buf = img_buf
+        self.__array_interface__ = array.__array_interface__
+
+
+# header of a shared memory block: magic, array dtype, wavelength dtype,
+# ndim, shape (padded to 3), width, height, channels, wavelength count
+_SHARED_HEADER = struct.Struct("<8s16s16s8q")
+_SHARED_MAGIC = b"CUVISIMG"
+_SHARED_ALIGN = 64
+
+
+def _shared_offsets(n_wavelength: int, wl_itemsize: int) -> tuple[int, int]:
+    wl_offset = -(-_SHARED_HEADER.size // _SHARED_ALIGN) * _SHARED_ALIGN
+    data_offset = wl_offset + n_wavelength * wl_itemsize
+    return wl_offset, -(-data_offset // _SHARED_ALIGN) * _SHARED_ALIGN
+
+
+def _attach_shared(name: str) -> shared_memory.SharedMemory:
+    if sys.version_info >= (3, 13):
+        # only the creating SharedImage unlinks the block
+        return shared_memory.SharedMemory(name=name, track=False)
+    # before 3.13 attaching registers with the resource tracker, which child
+    # processes share with their parent, so the creator's unlink covers it
+    return shared_memory.SharedMemory(name=name)
+
+
+class _SharedOwner(object):
+    """
+    Holds an attached shared memory block for the arrays viewing it. The
+    mapping is closed once the last view has been garbage collected.
+    """
+    __slots__ = ("_array", "_shm", "__array_interface__")
+
+    def __init__(self, array: np.ndarray, shm: shared_memory.SharedMemory):
+        self._array = array
+        self._shm = shm
+        self.__array_interface__ = array.__array_interface__
+
+    def __del__(self):
+        # the buffer export of the array has to go before the mapping
+        self._array = None
+        try:
+            self._shm.close()
+        except (BufferError, OSError):
+            pass
+
+
+class SharedImage(object):
+    """
+    An ImageData copied to a named shared memory block.
+
+    Only `name` has to be sent to other processes, which attach to the
+    block with `ImageData.from_shared(name)` without copying the cube.
+    Attached views keep their process's mapping open until they are
+    collected; the block itself is removed when the SharedImage that
+    created it is closed, so keep it open until the consumers have
+    attached, e.g. until their futures are done.
+
+    Example:
+        with cube.to_shared() as shared:
+            result = executor.submit(analyze, shared.name).result()
+
+        def analyze(name):
+            cube = cuvis.ImageData.from_shared(name)
+    """
+
+    def __init__(self, image: "ImageData"):
+        array = np.asarray(image.array)
+        wavelength = image.wavelength if image.wavelength is not None \
+            else np.empty(0, dtype=np.float64)
+        wl_offset, data_offset = _shared_offsets(len(wavelength), wavelength.dtype.itemsize)
+        self._shm = shared_memory.SharedMemory(create=True,
+                                               size=max(data_offset + array.nbytes, 1))
+        shape = tuple(array.shape) + (0,) * (3 - array.ndim)
+        _SHARED_HEADER.pack_into(
+            self._shm.buf, 0, _SHARED_MAGIC, array.dtype.str.encode(),
+            wavelength.dtype.str.encode(), array.ndim, *shape,
+            image.width or 0, image.height or 0, image.channels or 0,
+            len(wavelength) if image.wavelength is not None else -1)
+        np.frombuffer(self._shm.buf, dtype=wavelength.dtype, count=len(wavelength),
+                      offset=wl_offset)[:] = wavelength
+        target = np.frombuffer(self._shm.buf, dtype=array.dtype, count=array.size,
+                               offset=data_offset)
+        np.copyto(target.reshape(array.shape), array)
+        del target
+        self._name = self._shm.name
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def closed(self) -> bool:
+        return self._shm is None
+
+    def close(self) -> None:
+        """
+        Removes the shared memory block. Processes that are still attached
+        keep their mapping, new attachments fail.
+        """
+        if self._shm is None:
+            return
+        shm, self._shm = self._shm, None
+        try:
+            shm.close()
+        finally:
+            shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __del__(self):
+        self.close()
 
 
 class ImageData(object):
     def __init__(self, img_buf=None, dformat=None):
+        self._wl_lookup = None
+        self._pyramid = None
 
         if img_buf is None:
 
@@ -34,17 +426,17 @@ class ImageData(object):
                 self.array = cuvis_il.cuvis_read_imbuf_float32(img_buf)
             else:
                 raise SDKException()
+            self.array = np.asarray(_BufferOwner(self.array, img_buf))
 
             self.width = img_buf.width
             self.height = img_buf.height
             self.channels = img_buf.channels
 
             if img_buf.wavelength is not None:
-                self.wavelength = [
-                    cuvis_il.p_unsigned_int_getitem(
-                        img_buf.wavelength, z) for z
-                    in
-                    range(self.channels)]
+                self.wavelength = _intern_wavelength(
+                    _read_wavelength(img_buf, self.channels))
+            else:
+                self.wavelength = None
 
             # print("got image of size {}.".format(self.array.shape))
 
@@ -52,6 +444,38 @@ class ImageData(object):
             raise TypeError(
                 "Wrong data type for image buffer: {}".format(type(img_buf)))
 
+    # Array protocols, all of them hand out the underlying memory without copying
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        if self.array is None:
+            raise ValueError("Image array is not initialized.")
+        if copy:
+            return np.array(self.array, dtype=dtype, copy=True)
+        if dtype is not None and np.dtype(dtype) != self.array.dtype:
+            if copy is False:
+                raise ValueError("Converting the image data to {} requires a copy.".format(dtype))
+            return self.array.astype(dtype)
+        return self.array
+
+    @property
+    def __array_interface__(self) -> dict:
+        if self.array is None:
+            raise AttributeError("Image array is not initialized.")
+        return self.array.__array_interface__
+
+    def __buffer__(self, flags: int) -> memoryview:
+        if self.array is None:
+            raise ValueError("Image array is not initialized.")
+        return memoryview(self.array)
+
+    def __dlpack__(self, *args, **kwargs):
+        if self.array is None:
+            raise ValueError("Image array is not initialized.")
+        return self.array.__dlpack__(*args, **kwargs)
+
+    def __dlpack_device__(self):
+        return self.array.__dlpack_device__()
+
     def __getitem__(self, key) -> Union[np.ndarray, tuple[np.ndarray, np.ndarray], object]:
         """
         Enables slicing and indexing of the image data.
@@ -64,36 +488,538 @@ class ImageData(object):
             raise ValueError("Image array is not initialized.")
         sliced_array = self.array[key]
 
-        if sliced_array.ndim == 1:
-            start_band, end_band = self._get_band_range(key)
-            return sliced_array, self.wavelength[start_band:end_band]
+        if sliced_array.ndim == 0:
+            return sliced_array
+        elif sliced_array.ndim == 1:
+            return sliced_array, self._get_band_wavelength(key)
         elif sliced_array.ndim == 2:
             return sliced_array
-        elif sliced_array.ndim == 3 and sliced_array.shape[-1] > 1:
-            if self.wavelength is None:
-                raise ValueError("Wavelength data is not available.")
-            start_band, end_band = self._get_band_range(key)
-            sliced_wavelength = self.wavelength[start_band:end_band]
-            return ImageData.from_array(
-                sliced_array,
-                width=sliced_array.shape[1],
-                height=sliced_array.shape[0],
-                channels=sliced_array.shape[2],
-                wavelength=sliced_wavelength,
-            )
-
-    def _get_band_range(self, key):
-        """
-        Helper method to determine the band range based on the slicing key.
-        """
-        if isinstance(key, tuple) and len(key) == 3:
-            if isinstance(key[2], slice):
-                start = key[2].start or 0
-                stop = key[2].stop or self.channels
-                return start, stop
-            elif isinstance(key[2], int):
-                return key[2], key[2] + 1
-        return 0, self.channels
+        elif sliced_array.ndim == 3:
+            return self._derive(sliced_array, self._get_band_wavelength(key))
+
+    def _get_band_wavelength(self, key) -> Optional[np.ndarray]:
+        """
+        Helper method to determine the wavelengths selected by the slicing key.
+        Supports slice steps, negative indices and index lists along the band axis,
+        as well as Ellipsis, boolean masks over several axes and keys for fewer
+        than three axes.
+        """
+        if self.wavelength is None:
+            return None
+        key = key if isinstance(key, tuple) else (key,)
+        consumed = [_index_axes(k) for k in key]
+        axis = 0
+        for k, n in zip(key, consumed):
+            if k is Ellipsis:
+                axis += self.array.ndim - sum(consumed)
+                continue
+            if axis <= 2 < axis + n:
+                if n > 1:
+                    # the band coordinates of the pixels a mask selects
+                    k = np.nonzero(k)[2 - axis]
+                return np.atleast_1d(self.wavelength[k])
+            axis += n
+        return np.atleast_1d(self.wavelength)
+
+    def _derive(self, array: np.ndarray, wavelength=None):
+        """
+        Creates a new ImageData for the given (view of the) array that keeps
+        the underlying image buffer of this instance alive.
+        """
+        instance = ImageData.from_array(
+            array,
+            width=array.shape[1],
+            height=array.shape[0],
+            channels=array.shape[2] if array.ndim == 3 else 1,
+            wavelength=wavelength,
+        )
+        instance._img_buf = self._img_buf
+        return instance
+
+    def _wavelength_lookup(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the sorted wavelengths and their band order, cached per wavelength array.
+        """
+        if self.wavelength is None:
+            raise ValueError("Wavelength data is not available.")
+        cached = self._wl_lookup
+        if cached is None or cached[0] is not self.wavelength:
+            wl = np.asarray(self.wavelength)
+            order = np.argsort(wl, kind="stable")
+            cached = (self.wavelength, wl[order], order)
+            self._wl_lookup = cached
+        return cached[1], cached[2]
+
+    def band_index(self, nm, tolerance: Optional[float] = None) -> Union[int, np.ndarray]:
+        """
+        Returns the index of the band closest to the given wavelength(s) in nanometers.
+
+        Parameters
+        ----------
+        nm : float or array_like
+            Wavelength(s) to look up.
+        tolerance : float, optional
+            Maximum allowed distance in nanometers. Raises a ValueError if exceeded.
+        """
+        sorted_wl, order = self._wavelength_lookup()
+        query = np.asarray(nm, dtype=np.float64)
+        pos = _nearest_sorted(sorted_wl, query)
+        if tolerance is not None:
+            distance = np.abs(sorted_wl[pos] - query)
+            if np.any(distance > tolerance):
+                raise ValueError(
+                    "No band within {} nm of the requested wavelength(s) {}.".format(tolerance, nm))
+        idx = order[pos]
+        return int(idx) if idx.ndim == 0 else idx
+
+    def sel(self, nm=None, range_nm: Optional[tuple[float, float]] = None,
+            tolerance: Optional[float] = None):
+        """
+        Selects bands by wavelength instead of by position.
+
+        Example:
+            band = image_data.sel(nm=550)  # Nearest band to 550 nm
+            bands = image_data.sel(nm=[450, 550, 650])  # Several bands
+            vis = image_data.sel(range_nm=(400, 700))  # All bands within [400, 700] nm
+
+        Returns a new ImageData object that is a view on this one whenever
+        the selected bands can be expressed as a slice.
+        """
+        if (nm is None) == (range_nm is None):
+            raise ValueError("Exactly one of 'nm' and 'range_nm' has to be given.")
+        if self.array is None:
+            raise ValueError("Image array is not initialized.")
+
+        if range_nm is not None:
+            lo, hi = range_nm
+            sorted_wl, order = self._wavelength_lookup()
+            start = int(np.searchsorted(sorted_wl, lo, side="left"))
+            stop = int(np.searchsorted(sorted_wl, hi, side="right"))
+            bands = order[start:stop]
+        else:
+            bands = np.atleast_1d(self.band_index(nm, tolerance=tolerance))
+
+        band_key = _as_slice(bands)
+        if band_key is None:
+            band_key = bands
+        return self._derive(self.array[:, :, band_key], self.wavelength[band_key])
+
+    def resample(self, target_wavelength, method=None, fwhm: Optional[float] = None):
+        """
+        Resamples the cube onto the given wavelength grid.
+        See :class:`cuvis.resampling.SpectralResampler` for details.
+        """
+        from .resampling import SpectralResampler
+        from .cuvis_types import ResamplingMethod
+        if method is None:
+            method = ResamplingMethod.Linear
+        return SpectralResampler(target_wavelength, method, fwhm).apply(self)
+
+    def band_math(self, expressions, out=None, tolerance: Optional[float] = None, dtype=np.float32):
+        """
+        Evaluates band math expressions such as "(b800 - b670) / (b800 + b670)".
+        See :func:`cuvis.band_math.evaluate_band_math` for details.
+        """
+        from .band_math import evaluate_band_math
+        return evaluate_band_math(self, expressions, out=out, tolerance=tolerance, dtype=dtype)
+
+    def iter_tiles(self, tile_shape: Union[int, tuple[int, int]], overlap: int = 0) -> Iterator[Tile]:
+        """
+        Iterates over spatial windows of the image without copying.
+
+        Each yielded Tile holds a view with `overlap` extra pixels on every
+        side (clipped at the image border) together with its offset and
+        wavelength metadata. Use :func:`write_tiles` to assemble results.
+        """
+        if self.array is None:
+            raise ValueError("Image array is not initialized.")
+        if isinstance(tile_shape, int):
+            tile_shape = (tile_shape, tile_shape)
+        th, tw = tile_shape
+        if th <= 0 or tw <= 0 or overlap < 0:
+            raise ValueError("Tile shape must be positive and overlap non-negative.")
+        height, width = self.array.shape[:2]
+        for ys, ye, cys, cye in _tile_bounds(height, th, overlap):
+            for xs, xe, cxs, cxe in _tile_bounds(width, tw, overlap):
+                yield Tile(image=self._derive(self.array[ys:ye, xs:xe], self.wavelength),
+                           offset=(ys, xs),
+                           core=(slice(cys, cye), slice(cxs, cxe)))
+
+    def map_tiles(self, func: Callable[[Tile], np.ndarray],
+                  tile_shape: Union[int, tuple[int, int]], overlap: int = 0,
+                  out: Optional[np.ndarray] = None,
+                  max_workers: Optional[int] = None) -> np.ndarray:
+        """
+        Applies `func` tile by tile and assembles the results.
+
+        `func` receives a Tile and returns an array covering the tile window.
+        The output is allocated from the first result unless `out` is given.
+        With `max_workers` the tiles are processed on a thread pool, which
+        pays off for NumPy code that releases the GIL.
+        """
+        tiles = self.iter_tiles(tile_shape, overlap)
+        height, width = self.array.shape[:2]
+
+        def _store(tile, result):
+            nonlocal out
+            result = np.asarray(result)
+            if out is None:
+                out = np.empty((height, width) + result.shape[2:], dtype=result.dtype)
+            write_tiles([(tile, result)], out)
+
+        first = next(tiles, None)
+        if first is None:
+            return out
+        _store(first, func(first))
+        if max_workers is None or max_workers <= 1:
+            for tile in tiles:
+                _store(tile, func(tile))
+        else:
+            # keep a bounded number of tile results in flight
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                pending = deque()
+                for tile in tiles:
+                    pending.append((tile, pool.submit(func, tile)))
+                    if len(pending) >= 2 * max_workers:
+                        done_tile, future = pending.popleft()
+                        _store(done_tile, future.result())
+                while pending:
+                    done_tile, future = pending.popleft()
+                    _store(done_tile, future.result())
+        return out
+
+    def pyramid(self, levels: Optional[int] = None) -> list:
+        """
+        Returns a list of progressively downsampled images, starting with this one.
+
+        Every level averages 2x2 pixel blocks of the previous one (an odd last
+        row or column is dropped). Without `levels`, halving continues until
+        one side is a single pixel. Levels are computed once and cached.
+        """
+        if self.array is None:
+            raise ValueError("Image array is not initialized.")
+        if self._pyramid is None or self._pyramid[0].array is not self.array:
+            self._pyramid = [self]
+        if levels is None:
+            levels = int(np.log2(max(min(self.array.shape[:2]), 1))) + 1
+        while len(self._pyramid) < levels:
+            src = self._pyramid[-1].array
+            h, w = src.shape[0] // 2, src.shape[1] // 2
+            if h == 0 or w == 0:
+                break
+            blocks = src[:2 * h, :2 * w].reshape((h, 2, w, 2) + src.shape[2:])
+            # float32 is exact for sums of 16 bit values, wider data needs float64
+            accumulate = np.float32 if src.dtype.itemsize <= 2 else np.float64
+            mean = blocks.mean(axis=(1, 3), dtype=accumulate)
+            if src.dtype.kind in "ui":
+                mean = np.rint(mean, out=mean)
+            level = ImageData.from_array(mean.astype(src.dtype, copy=False), width=w, height=h,
+                                         channels=self.channels, wavelength=self.wavelength)
+            self._pyramid.append(level)
+        return self._pyramid[:levels]
+
+    def preview(self, size: Union[int, tuple[int, int]]):
+        """
+        Returns the coarsest pyramid level that is still at least `size`
+        large, given either as the longer edge or as (height, width).
+        """
+        if self.array is None:
+            raise ValueError("Image array is not initialized.")
+        best = self
+        for level in self.pyramid():
+            if not level.covers(size):
+                break
+            best = level
+        return best
+
+    def covers(self, size: Union[int, tuple[int, int]]) -> bool:
+        """
+        True if the image is at least `size` large, given either as the
+        longer edge or as (height, width).
+        """
+        height, width = self.array.shape[:2]
+        if isinstance(size, int):
+            return max(height, width) >= size
+        return height >= size[0] and width >= size[1]
+
+    def roi_spectra(self, labels: np.ndarray, ignore_label: Optional[int] = None) -> ROISpectra:
+        """
+        Computes mean, standard deviation and pixel count spectra for every
+        label of an integer label image.
+
+        Pixels are sorted by label once and all bands of a label are reduced
+        together, in chunks of whole pixel spectra.
+
+        Pixels with `ignore_label` (e.g. a background label 0) are skipped.
+        """
+        if self.array is None:
+            raise ValueError("Image array is not initialized.")
+        labels = np.asarray(labels)
+        if labels.shape != self.array.shape[:2]:
+            raise ValueError("Label image of shape {} does not match the image {}.".format(
+                labels.shape, self.array.shape[:2]))
+        if labels.dtype.kind not in "iub":
+            raise TypeError("Label image must be of integer type.")
+        pixels = self.array.reshape(-1, self.array.shape[2] if self.array.ndim == 3 else 1)
+        flat = labels.reshape(-1)
+        if ignore_label is not None:
+            valid = flat != ignore_label
+            flat = flat[valid]
+            pixels = pixels[valid]
+
+        if len(flat) and flat.min() >= 0 and flat.max() <= 4 * len(flat):
+            # dense label range, bin directly on the label values
+            unique = None
+            bins = flat.astype(np.intp, copy=False)
+            n_bins = int(bins.max()) + 1
+        else:
+            unique, bins = np.unique(flat, return_inverse=True)
+            bins = bins.reshape(-1)
+            n_bins = len(unique)
+
+        count = np.bincount(bins, minlength=n_bins)
+        present = np.flatnonzero(count)
+        count = count[present]
+        label_values = present.astype(labels.dtype) if unique is None else unique[present]
+        n_bands = pixels.shape[1]
+        # shift by the band means to keep the sums of squares well conditioned
+        shift = pixels.mean(axis=0, dtype=np.float64) if len(pixels) else np.zeros(n_bands)
+        sums = np.zeros((len(present), n_bands))
+        squares = np.zeros((len(present), n_bands))
+        order = np.argsort(bins, kind="stable")
+        sorted_bins = bins[order]
+        for start in range(0, len(order), _ROI_CHUNK_PIXELS):
+            block = pixels[order[start:start + _ROI_CHUNK_PIXELS]].astype(np.float64)
+            block -= shift
+            block_bins = sorted_bins[start:start + _ROI_CHUNK_PIXELS]
+            segments = np.flatnonzero(np.r_[True, block_bins[1:] != block_bins[:-1]])
+            rows = np.searchsorted(present, block_bins[segments])
+            sums[rows] += np.add.reduceat(block, segments, axis=0)
+            block *= block
+            squares[rows] += np.add.reduceat(block, segments, axis=0)
+        band_mean = sums / count[:, None]
+        mean = band_mean + shift
+        std = np.sqrt(np.maximum(squares / count[:, None] - band_mean ** 2, 0.0))
+        return ROISpectra(labels=label_values, mean=mean, std=std, count=count,
+                          wavelength=self.wavelength)
+
+    def interleave(self, layout: Interleave) -> np.ndarray:
+        """
+        Returns the cube in the given band interleave as a view.
+
+        ImageData stores cubes as BIP (rows, columns, bands); BIL yields
+        (rows, bands, columns) and BSQ (bands, rows, columns).
+        """
+        if self.array is None:
+            raise ValueError("Image array is not initialized.")
+        array = self.array if self.array.ndim == 3 else self.array[:, :, None]
+        return array.transpose(_INTERLEAVE_AXES[layout])
+
+    def contiguous(self, layout: Interleave = Interleave.BIP,
+                   pool: Optional[BufferPool] = None) -> np.ndarray:
+        """
+        Returns the cube in the given interleave as a C-contiguous array.
+
+        Copies only if the requested layout is not already contiguous in
+        memory, into an array acquired from `pool` if given.
+        """
+        view = self.interleave(layout)
+        if view.flags.c_contiguous:
+            return view
+        out = pool.acquire(view.shape, view.dtype) if pool is not None \
+            else np.empty(view.shape, dtype=view.dtype)
+        np.copyto(out, view)
+        return out
+
+    def save_envi(self, path: Union[str, Path], layout: Interleave = Interleave.BSQ,
+                  pool: Optional[BufferPool] = None) -> Path:
+        """
+        Writes the cube as ENVI raw file (.raw) plus header (.hdr) in the
+        given interleave and returns the path of the header.
+        """
+        dtype = self.array.dtype
+        if dtype not in _ENVI_DATA_TYPES:
+            raise ValueError("Data type {} cannot be stored as ENVI.".format(dtype))
+        path = Path(path).with_suffix("")
+        data = self.contiguous(layout, pool)
+        bands = data.shape[_INTERLEAVE_AXES[layout].index(2)]
+        data.tofile(path.with_suffix(".raw"))
+        if pool is not None and not np.may_share_memory(data, self.array):
+            pool.release(data)
+
+        header = ["ENVI",
+                  "samples = {}".format(self.array.shape[1]),
+                  "lines = {}".format(self.array.shape[0]),
+                  "bands = {}".format(bands),
+                  "header offset = 0",
+                  "file type = ENVI Standard",
+                  "data type = {}".format(_ENVI_DATA_TYPES[dtype]),
+                  "interleave = {}".format(layout.name.lower()),
+                  "byte order = {}".format(0 if np.little_endian else 1)]
+        if self.wavelength is not None:
+            header.append("wavelength units = Nanometers")
+            header.append("wavelength = {{{}}}".format(", ".join(str(w) for w in self.wavelength)))
+        header_path = path.with_suffix(".hdr")
+        header_path.write_text("\n".join(header) + "\n")
+        return header_path
+
+    @property
+    def owns_data(self) -> bool:
+        """
+        True if the array lives in Python-owned memory rather than in a
+        buffer managed by the SDK (and thereby by its Measurement).
+        """
+        return self._img_buf is None
+
+    def detach(self, out: Optional[np.ndarray] = None, pool: Optional[BufferPool] = None):
+        """
+        Copies the image into Python-owned memory, so it stays valid after
+        the Measurement it came from has been released.
+
+        The copy is written to `out` if given, which must match the shape
+        and dtype of the image, or to an array acquired from `pool`.
+        Does nothing if the data is already owned. Returns this instance.
+        """
+        if self.owns_data or self.array is None:
+            return self
+        if out is None and pool is not None:
+            out = pool.acquire(self.array.shape, self.array.dtype)
+        if out is None:
+            array = self.array.copy()
+        else:
+            if out.shape != self.array.shape or out.dtype != self.array.dtype:
+                raise ValueError("Output buffer of shape {} and type {} does not match {} {}.".format(
+                    out.shape, out.dtype, self.array.shape, self.array.dtype))
+            np.copyto(out, self.array)
+            array = out
+        self.array = array
+        self._img_buf = None
+        return self
+
+    @property
+    def dtype(self) -> np.dtype:
+        return self.array.dtype
+
+    def astype(self, dtype, scale=None, offset=None, out: Optional[np.ndarray] = None,
+               pool: Optional[BufferPool] = None):
+        """
+        Converts the image to `dtype`, computing `array * scale + offset` on the way.
+
+        `scale` and `offset` may be scalars or per-band arrays. The result is
+        written to `out` or to an array acquired from `pool` if given, so
+        repeated conversions do not allocate. Returns a new ImageData that
+        owns its data.
+
+        Example:
+            refl = cube.astype(np.float32, scale=1 / 4096, pool=pool)
+        """
+        if self.array is None:
+            raise ValueError("Image array is not initialized.")
+        dtype = np.dtype(dtype)
+        if out is None:
+            if pool is not None:
+                out = pool.acquire(self.array.shape, dtype)
+            else:
+                out = np.empty(self.array.shape, dtype=dtype)
+        elif out.shape != self.array.shape or out.dtype != dtype:
+            raise ValueError("Output buffer of shape {} and type {} does not match {} {}.".format(
+                out.shape, out.dtype, self.array.shape, dtype))
+
+        if scale is None and offset is None:
+            np.copyto(out, self.array, casting="unsafe")
+        elif dtype.kind in "fc":
+            np.multiply(self.array, 1 if scale is None else scale, out=out,
+                        dtype=dtype, casting="unsafe")
+            if offset is not None:
+                np.add(out, offset, out=out, dtype=dtype, casting="unsafe")
+        else:
+            # integer targets are computed in double precision, rounded,
+            # clipped to the target range and cast once
+            shape = self.array.shape
+            tmp = pool.acquire(shape, np.float64) if pool is not None \
+                else np.empty(shape, dtype=np.float64)
+            np.multiply(self.array, 1 if scale is None else scale, out=tmp, dtype=np.float64)
+            if offset is not None:
+                np.add(tmp, offset, out=tmp)
+            np.rint(tmp, out=tmp)
+            if dtype.kind in "iu":
+                info = np.iinfo(dtype)
+                np.clip(tmp, info.min, info.max, out=tmp)
+            np.copyto(out, tmp, casting="unsafe")
+            if pool is not None:
+                pool.release(tmp)
+        return ImageData.from_array(out, width=self.width, height=self.height,
+                                    channels=self.channels, wavelength=self.wavelength)
+
+    def fingerprint(self, samples: int = 4096, digest_size: int = 16) -> str:
+        """
+        Returns a hex digest identifying the image content.
+
+        Hashes (blake2b) the shape, data type, wavelength and the spectra of
+        up to `samples` pixels spread evenly over the image, so the cost
+        does not depend on the image size. Images that differ only in pixels
+        between the samples get the same fingerprint.
+        """
+        if self.array is None:
+            raise ValueError("Image array is not initialized.")
+        return self._update_hash(hashlib.blake2b(digest_size=digest_size), samples).hexdigest()
+
+    def _update_hash(self, h, samples: int):
+        array = self.array
+        h.update(repr((array.shape, array.dtype.str)).encode())
+        if self.wavelength is not None:
+            h.update(np.ascontiguousarray(self.wavelength).tobytes())
+        n = array.shape[0] * array.shape[1] if array.ndim >= 2 else len(array)
+        step = max(1, n // max(samples, 1))
+        picked = np.arange(0, n, step)[:samples]
+        if array.ndim >= 2:
+            # index the pixels directly, reshaping a view would copy the whole cube
+            sampled = array[np.divmod(picked, array.shape[1])]
+        else:
+            sampled = array[picked]
+        h.update(np.ascontiguousarray(sampled).tobytes())
+        return h
+
+    def to_shared(self) -> SharedImage:
+        """
+        Copies the image and its wavelength to a shared memory block that
+        other processes can attach to with `from_shared`.
+        """
+        if self.array is None:
+            raise ValueError("Image array is not initialized.")
+        return SharedImage(self)
+
+    @classmethod
+    def from_shared(cls, name: Union[str, SharedImage]) -> "ImageData":
+        """
+        Attaches to a shared memory block created by `to_shared`.
+
+        The returned image views the block without copying; the mapping is
+        released once the image and all arrays derived from it are gone.
+        """
+        if isinstance(name, SharedImage):
+            name = name.name
+        shm = _attach_shared(name)
+        try:
+            magic, dtype, wl_dtype, ndim, *fields = _SHARED_HEADER.unpack_from(shm.buf, 0)
+            if magic != _SHARED_MAGIC:
+                raise ValueError("Shared memory block '{}' does not hold an image.".format(name))
+            shape, (width, height, channels, n_wavelength) = tuple(fields[:ndim]), fields[3:]
+            dtype = np.dtype(dtype.rstrip(b"\0").decode())
+            wl_dtype = np.dtype(wl_dtype.rstrip(b"\0").decode())
+            wl_offset, data_offset = _shared_offsets(max(n_wavelength, 0), wl_dtype.itemsize)
+            wavelength = None
+            if n_wavelength >= 0:
+                wavelength = np.frombuffer(shm.buf, dtype=wl_dtype, count=n_wavelength,
+                                           offset=wl_offset).copy()
+            array = np.frombuffer(shm.buf, dtype=dtype, count=int(np.prod(shape)),
+                                  offset=data_offset).reshape(shape)
+        except Exception:
+            shm.close()
+            raise
+        array = np.asarray(_SharedOwner(array, shm))
+        return cls.from_array(array, width=width, height=height, channels=channels,
+                              wavelength=wavelength)
 
     def to_numpy(self) -> np.ndarray:
         """
@@ -111,6 +1037,6 @@ class ImageData(object):
         instance.width = width
         instance.height = height
         instance.channels = channels
-        instance.wavelength = wavelength
+        instance.wavelength = _intern_wavelength(wavelength)
         instance._img_buf = None
         return instance
@@ -237,6 +237,24 @@ __CuvisSessionMergeMode__ = {
 __SessionMergeMode__ = __inverseTranslationDict(__CuvisSessionMergeMode__)
 
 
+class ResamplingMethod(Enum):
+    Nearest = 1
+    Linear = 2
+    Gaussian = 3
+
+
+class SpectralMetric(Enum):
+    SAM = 1
+    SID = 2
+    Correlation = 3
+
+
+class Interleave(Enum):
+    BIP = 1
+    BIL = 2
+    BSQ = 3
+
+
 class AsyncResult(Enum):
     done = 0
     timeout = 1
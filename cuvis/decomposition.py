@@ -0,0 +1,194 @@
+from .band_statistics import BandStatistics
+from .cube_utils import ImageData
+
+import numpy as np
+
+from typing import Iterable, Optional, Union
+
+# pixels projected at once, bounds the float working set of transform()
+_BLOCK_PIXELS = 1 << 16
+
+
+class PCA(object):
+    """
+    Principal component analysis fitted incrementally from a stream of cubes.
+
+    Fitting only keeps a BandStatistics covariance accumulator, so arbitrarily
+    long recordings can be used. With `sample_pixels`, a random subset of
+    that many pixels is taken from every cube.
+
+    Example:
+        pca = PCA(n_components=10, sample_pixels=5000).fit(SessionFile("recording.cu3s"))
+        reduced = pca.transform(mesu.cube)
+    """
+
+    def __init__(self, n_components: int, sample_pixels: Optional[int] = None,
+                 random_state: Optional[int] = None, dtype=np.float32):
+        self._n_components = n_components
+        self._sample_pixels = sample_pixels
+        self._rng = np.random.default_rng(random_state)
+        self._dtype = np.dtype(dtype)
+        self._stats = BandStatistics(covariance=True)
+        self._components = None
+        self._explained_variance = None
+        self._total_variance = None
+        self._mean = None
+        self._projection = None
+        self._bias = None
+
+    @property
+    def components(self) -> np.ndarray:
+        """The (n_components, channels) projection matrix."""
+        self._check_fitted()
+        return self._components
+
+    @property
+    def mean(self) -> np.ndarray:
+        self._check_fitted()
+        return self._mean
+
+    @property
+    def explained_variance(self) -> np.ndarray:
+        self._check_fitted()
+        return self._explained_variance
+
+    @property
+    def explained_variance_ratio(self) -> np.ndarray:
+        self._check_fitted()
+        return self._explained_variance / self._total_variance
+
+    def _sample(self, cube: Union[ImageData, np.ndarray]) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the cube and the flat indices of the sampled pixels.
+        """
+        array = cube.array if isinstance(cube, ImageData) else np.asarray(cube)
+        if array is None or array.ndim != 3:
+            raise ValueError("Fitting requires three-dimensional cubes.")
+        n_pixels = array.shape[0] * array.shape[1]
+        if self._sample_pixels is None or self._sample_pixels >= n_pixels:
+            return array, np.arange(n_pixels)
+        return array, np.sort(self._rng.choice(n_pixels, self._sample_pixels, replace=False))
+
+    def partial_fit(self, cube: Union[ImageData, np.ndarray]) -> "PCA":
+        """
+        Adds one cube to the covariance accumulator.
+        """
+        array, idx = self._sample(cube)
+        self._stats.update(array.reshape(-1, array.shape[2])[idx])
+        self._components = None
+        return self
+
+    def fit(self, items: Iterable) -> "PCA":
+        """
+        Fits from an iterable of ImageData or Measurements, e.g. a SessionFile.
+        Measurements contribute their cube.
+        """
+        for item in items:
+            self.partial_fit(item if isinstance(item, (ImageData, np.ndarray)) else item.cube)
+            del item
+        self._solve()
+        return self
+
+    def _solve(self) -> None:
+        result = self._stats.finalize(ddof=1)
+        eigenvalues, eigenvectors = np.linalg.eigh(result.covariance)
+        order = np.argsort(eigenvalues)[::-1][:self._n_components]
+        self._set_projection(result.mean, eigenvectors[:, order].T, eigenvalues[order],
+                             float(np.trace(result.covariance)))
+
+    def _set_projection(self, mean, components, variance, total_variance) -> None:
+        self._mean = mean
+        self._components = components
+        self._explained_variance = variance
+        self._total_variance = total_variance
+        self._projection = np.ascontiguousarray(components.T, dtype=self._dtype)
+        self._bias = (mean @ components.T).astype(self._dtype)
+
+    def _check_fitted(self) -> None:
+        if self._components is None:
+            if self._stats.count == 0:
+                raise ValueError("{} has not been fitted yet.".format(type(self).__name__))
+            self._solve()
+
+    def transform(self, cube: Union[ImageData, np.ndarray], out: Optional[np.ndarray] = None):
+        """
+        Projects a cube onto the components.
+
+        Each block of pixels is projected with a single matrix product.
+        ImageData inputs return ImageData with one channel per component.
+        """
+        self._check_fitted()
+        array = cube.array if isinstance(cube, ImageData) else np.asarray(cube)
+        height, width, channels = array.shape
+        if channels != self._projection.shape[0]:
+            raise ValueError("Expected {} bands, got {}.".format(self._projection.shape[0], channels))
+        pixels = array.reshape(-1, channels)
+        n_components = self._projection.shape[1]
+        if out is None:
+            out = np.empty((height, width, n_components), dtype=self._dtype)
+        flat_out = out.reshape(-1, n_components)
+        for start in range(0, len(pixels), _BLOCK_PIXELS):
+            block = pixels[start:start + _BLOCK_PIXELS]
+            if block.dtype != self._dtype:
+                block = block.astype(self._dtype)
+            target = flat_out[start:start + len(block)]
+            np.matmul(block, self._projection, out=target)
+            target -= self._bias
+        if isinstance(cube, ImageData):
+            return ImageData.from_array(out, width=width, height=height, channels=n_components)
+        return out
+
+    def inverse_transform(self, components: Union[ImageData, np.ndarray]) -> np.ndarray:
+        """
+        Maps projected data back to the band space.
+        """
+        self._check_fitted()
+        array = components.array if isinstance(components, ImageData) else np.asarray(components)
+        return array @ self._components.astype(self._dtype) + self._mean.astype(self._dtype)
+
+
+class MNF(PCA):
+    """
+    Minimum noise fraction transform fitted incrementally from a stream of cubes.
+
+    Besides the signal covariance, the noise covariance is accumulated from
+    differences of horizontally neighbouring pixels. Components are ordered
+    by decreasing signal-to-noise ratio; `explained_variance` holds the
+    eigenvalues of the noise-whitened covariance.
+    """
+
+    def __init__(self, n_components: int, sample_pixels: Optional[int] = None,
+                 random_state: Optional[int] = None, dtype=np.float32):
+        super().__init__(n_components, sample_pixels, random_state, dtype)
+        self._noise = BandStatistics(covariance=True)
+
+    def partial_fit(self, cube: Union[ImageData, np.ndarray]) -> "MNF":
+        array, idx = self._sample(cube)
+        channels = array.shape[2]
+        flat = array.reshape(-1, channels)
+        self._stats.update(flat[idx])
+        # shift difference with the right neighbour, last column has none
+        idx = idx[(idx % array.shape[1]) < array.shape[1] - 1]
+        if len(idx):
+            diff = flat[idx + 1].astype(np.float64) - flat[idx]
+            self._noise.update(diff)
+        self._components = None
+        return self
+
+    def _solve(self) -> None:
+        signal = self._stats.finalize(ddof=1)
+        noise = self._noise.finalize(ddof=1)
+        noise_cov = noise.covariance / 2.0
+        d, u = np.linalg.eigh(noise_cov)
+        whitening = u / np.sqrt(np.maximum(d, np.finfo(np.float64).tiny))
+        eigenvalues, eigenvectors = np.linalg.eigh(whitening.T @ signal.covariance @ whitening)
+        order = np.argsort(eigenvalues)[::-1][:self._n_components]
+        components = (whitening @ eigenvectors[:, order]).T
+        self._set_projection(signal.mean, components, eigenvalues[order],
+                             float(np.sum(eigenvalues)))
+
+    def inverse_transform(self, components: Union[ImageData, np.ndarray]) -> np.ndarray:
+        self._check_fitted()
+        array = components.array if isinstance(components, ImageData) else np.asarray(components)
+        back = np.linalg.pinv(self._components)
+        return array @ back.T.astype(self._dtype) + self._mean.astype(self._dtype)
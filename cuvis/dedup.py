@@ -0,0 +1,69 @@
+from .cube_utils import ImageData
+from .Measurement import Measurement
+
+import threading
+
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Union
+
+
+class Deduplicator(object):
+    """
+    Skips measurements whose fingerprint has been seen before.
+
+    Fingerprints are kept in memory and, with `path`, appended to a text
+    file (one per line) that is read back on construction, so duplicates
+    are also recognized across runs.
+
+    Example:
+        dedup = Deduplicator("~/.cuvis/ingested.txt")
+        for mesu in dedup.filter(SessionFile("recording.cu3s")):
+            pc.apply(mesu)
+    """
+
+    def __init__(self, path: Optional[Union[str, Path]] = None, samples: int = 4096):
+        self._samples = samples
+        self._seen = set()
+        self._lock = threading.Lock()
+        self._path = None
+        if path is not None:
+            self._path = Path(path).expanduser()
+            if self._path.exists():
+                with open(self._path) as f:
+                    self._seen.update(line.strip() for line in f if line.strip())
+
+    def fingerprint(self, item: Union[ImageData, Measurement]) -> str:
+        """Fingerprint of a Measurement or ImageData."""
+        return item.fingerprint(self._samples)
+
+    def add(self, item) -> bool:
+        """
+        Records the item and returns True if it had not been seen before.
+        """
+        fingerprint = self.fingerprint(item)
+        with self._lock:
+            if fingerprint in self._seen:
+                return False
+            self._seen.add(fingerprint)
+            if self._path is not None:
+                self._path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self._path, "a") as f:
+                    f.write(fingerprint + "\n")
+        return True
+
+    def filter(self, items: Iterable) -> Iterator:
+        """
+        Yields the items of e.g. a SessionFile that have not been seen before.
+        """
+        for item in items:
+            if self.add(item):
+                yield item
+
+    def __contains__(self, item) -> bool:
+        fingerprint = item if isinstance(item, str) else self.fingerprint(item)
+        with self._lock:
+            return fingerprint in self._seen
+
+    def __len__(self):
+        with self._lock:
+            return len(self._seen)
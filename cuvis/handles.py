@@ -0,0 +1,101 @@
+import threading
+import weakref
+
+from dataclasses import dataclass
+
+_enabled = False
+_lock = threading.Lock()
+_live = {}  # id(owner) -> weak reference to the handle-owning object
+
+
+@dataclass(frozen=True)
+class LiveHandle(object):
+    kind: str
+    handle: int
+    native_bytes: int  # SDK memory currently referenced, 0 if unknown
+
+    def __repr__(self):
+        return "'{} handle {}: {} bytes'".format(self.kind, self.handle, self.native_bytes)
+
+
+def enable_handle_tracking(enabled: bool = True) -> None:
+    """
+    Starts (or stops) recording SDK handles owned by Python objects, as
+    reported by `live_handles`. Only handles created while tracking is
+    enabled are recorded.
+    """
+    global _enabled
+    with _lock:
+        _enabled = enabled
+        if not enabled:
+            _live.clear()
+
+
+def live_handles() -> list[LiveHandle]:
+    """
+    Returns the tracked handles that have not been freed yet, with the
+    approximate native memory they keep alive.
+    """
+    with _lock:
+        owners = [ref() for ref in _live.values()]
+    result = []
+    for owner in owners:
+        handle = getattr(owner, "_handle", None)
+        if handle is None:
+            continue
+        native_bytes = owner._native_bytes() if hasattr(owner, "_native_bytes") else 0
+        result.append(LiveHandle(type(owner).__name__, handle, native_bytes))
+    return result
+
+
+def _register(owner) -> None:
+    if not _enabled:
+        return
+    key = id(owner)
+    with _lock:
+        _live[key] = weakref.ref(owner, lambda _, key=key: _forget(key))
+
+
+def _unregister(owner) -> None:
+    if _live:
+        _forget(id(owner))
+
+
+def _forget(key: int) -> None:
+    with _lock:
+        _live.pop(key, None)
+
+
+class HandleOwner(object):
+    """
+    Base of the classes owning an SDK handle in `_handle`, freed by the
+    subclass in `_free` on `close`, at the end of a with block or on
+    garbage collection.
+    """
+
+    def _free(self, handle: int) -> None:
+        raise NotImplementedError
+
+    def _close_handle(self) -> None:
+        handle = getattr(self, "_handle", None)
+        if handle is None:
+            return
+        _unregister(self)
+        self._handle = None
+        self._free(handle)
+
+    def close(self) -> None:
+        """
+        Frees the SDK handle right away instead of on garbage collection.
+        Further calls do nothing.
+        """
+        self._close_handle()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __del__(self):
+        self.close()
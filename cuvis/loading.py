@@ -0,0 +1,81 @@
+from .Measurement import Measurement, _key_patterns
+from .SessionFile import SessionFile
+
+import os
+
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Union
+
+
+@dataclass(frozen=True)
+class LoadResult(object):
+    path: Path
+    item: Optional[Union[Measurement, SessionFile]]
+    error: Optional[BaseException] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def _load(path: Path, keys: Optional[frozenset]) -> LoadResult:
+    try:
+        if path.suffix.lower() == ".cu3s":
+            return LoadResult(path, SessionFile(path))
+        return LoadResult(path, Measurement(path, keys=keys))
+    except Exception as e:
+        return LoadResult(path, None, e)
+
+
+def load_many(paths: Iterable[Union[str, Path]], max_workers: Optional[int] = None,
+              keys: Optional[Iterable[str]] = None, ordered: bool = False) -> Iterator[LoadResult]:
+    """
+    Opens many .cu3 Measurements or .cu3s SessionFiles concurrently.
+
+    Files are loaded on a thread pool with at most `2 * max_workers` loads
+    in flight, so memory stays bounded however many paths are given;
+    `paths` may be a lazy iterable. Results are yielded as they complete,
+    or in input order with `ordered`. A file that fails to load yields a
+    LoadResult carrying the error instead of aborting the batch. `keys`
+    selects the data items of Measurements (see `Measurement`).
+
+    Example:
+        for res in cuvis.load_many(Path("archive").rglob("*.cu3"), keys={"cube"}):
+            if res.ok:
+                index(res.item)
+    """
+    if max_workers is None:
+        max_workers = min(32, (os.cpu_count() or 1) + 4)
+    keys = _key_patterns(keys)
+    paths = iter(paths)
+    limit = 2 * max_workers
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    pending = deque() if ordered else set()
+    try:
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < limit:
+                path = next(paths, None)
+                if path is None:
+                    exhausted = True
+                    break
+                future = pool.submit(_load, Path(path), keys)
+                if ordered:
+                    pending.append(future)
+                else:
+                    pending.add(future)
+            if not pending:
+                return
+            if ordered:
+                yield pending.popleft().result()
+            else:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+    finally:
+        for future in pending:
+            future.cancel()
+        pool.shutdown(wait=True)
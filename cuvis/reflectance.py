@@ -0,0 +1,136 @@
+from .cube_utils import ImageData, BufferPool
+from .Measurement import Measurement
+
+import threading
+import weakref
+import numpy as np
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Sequence, Union
+
+Reference = Union[Measurement, ImageData, np.ndarray]
+
+
+@dataclass(frozen=True)
+class _ReferencePair(object):
+    dark: np.ndarray
+    inverse: np.ndarray  # scale / (white - dark), zero where undefined
+    wavelength: Optional[np.ndarray]
+
+
+def _reference_key(ref: Reference) -> tuple:
+    """
+    Identifies a reference. Measurements are identified by their metadata,
+    arrays by object identity (validated through a weak reference).
+    """
+    if isinstance(ref, Measurement):
+        return ("mesu", ref.path, ref.capture_time, ref.frame_id, ref.serial_number,
+                ref.processing_mode), None
+    return ("array", id(ref)), weakref.ref(ref)
+
+
+def _reference_array(ref: Reference) -> tuple[np.ndarray, Optional[np.ndarray]]:
+    if isinstance(ref, Measurement):
+        ref = ref.cube
+    if isinstance(ref, ImageData):
+        return ref.array, ref.wavelength
+    return np.asarray(ref), None
+
+
+class ReflectanceCorrector(object):
+    """
+    Converts raw cubes to reflectance in NumPy: (raw - dark) * scale / (white - dark).
+
+    The dark frame and the inverse white-dark difference are computed once
+    per reference pair and kept in an LRU cache, so a batch of raw cubes
+    recorded with the same references costs one subtraction and one
+    multiplication per cube, both done in place.
+
+    Example:
+        corrector = ReflectanceCorrector()
+        dark = session.get_reference(0, ReferenceType.Dark)
+        white = session.get_reference(0, ReferenceType.White)
+        for mesu in session:
+            refl = corrector.apply(mesu.cube, dark, white)
+    """
+
+    def __init__(self, scale: float = 1.0, max_cached: int = 4, dtype=np.float32):
+        self._scale = scale
+        self._max_cached = max_cached
+        self._dtype = np.dtype(dtype)
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._dark = None
+        self._white = None
+
+    def set_references(self, dark: Reference, white: Reference) -> None:
+        """
+        Sets the default references used by `apply`.
+        """
+        self._dark = dark
+        self._white = white
+        self._prepare(dark, white)
+
+    def _prepare(self, dark: Reference, white: Reference) -> _ReferencePair:
+        dark_key, dark_ref = _reference_key(dark)
+        white_key, white_ref = _reference_key(white)
+        key = (dark_key, white_key)
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                pair, refs = entry
+                if all(r is None or r() is not None for r in refs):
+                    self._cache.move_to_end(key)
+                    return pair
+
+        dark_array, wavelength = _reference_array(dark)
+        white_array, _ = _reference_array(white)
+        dark_array = dark_array.astype(self._dtype)
+        difference = white_array.astype(self._dtype) - dark_array
+        inverse = np.zeros_like(difference)
+        np.divide(self._scale, difference, out=inverse, where=difference > 0)
+        pair = _ReferencePair(dark_array, inverse, wavelength)
+
+        with self._lock:
+            self._cache[key] = (pair, (dark_ref, white_ref))
+            while len(self._cache) > self._max_cached:
+                self._cache.popitem(last=False)
+        return pair
+
+    def clear_cache(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    def apply(self, raw: Union[ImageData, np.ndarray, Sequence[ImageData]],
+              dark: Optional[Reference] = None, white: Optional[Reference] = None,
+              out: Optional[np.ndarray] = None, pool: Optional[BufferPool] = None):
+        """
+        Converts one raw cube, a stacked array of cubes or a list of cubes.
+
+        Results are written to `out` or to arrays acquired from `pool` if
+        given. ImageData inputs return ImageData, arrays return arrays.
+        """
+        if dark is None or white is None:
+            if self._dark is None or self._white is None:
+                raise ValueError("No dark and white references have been set.")
+            dark, white = self._dark, self._white
+        pair = self._prepare(dark, white)
+
+        if isinstance(raw, (list, tuple)):
+            if out is not None:
+                raise ValueError("'out' is not supported for lists of cubes.")
+            return [self._apply_one(r, pair, None, pool) for r in raw]
+        return self._apply_one(raw, pair, out, pool)
+
+    def _apply_one(self, raw, pair: _ReferencePair, out, pool):
+        array = raw.array if isinstance(raw, ImageData) else np.asarray(raw)
+        if out is None:
+            out = pool.acquire(array.shape, self._dtype) if pool is not None \
+                else np.empty(array.shape, dtype=self._dtype)
+        np.subtract(array, pair.dark, out=out, dtype=self._dtype, casting="unsafe")
+        np.multiply(out, pair.inverse, out=out)
+        if isinstance(raw, ImageData):
+            return ImageData.from_array(out, width=raw.width, height=raw.height,
+                                        channels=raw.channels, wavelength=raw.wavelength)
+        return out
@@ -0,0 +1,133 @@
+from .cube_utils import ImageData, _nearest_sorted
+from .cuvis_types import ResamplingMethod
+
+import functools
+import numpy as np
+
+from typing import Optional, Sequence, Union
+
+_FWHM_TO_SIGMA = 1.0 / (2.0 * np.sqrt(2.0 * np.log(2.0)))
+
+
+@functools.lru_cache(maxsize=64)
+def _resampling_matrix(source: tuple, target: tuple, method: ResamplingMethod,
+                       fwhm: Optional[float], dtype: str) -> np.ndarray:
+    """
+    Builds the (source channels x target channels) weight matrix that maps
+    spectra sampled at `source` onto the `target` grid.
+    """
+    src = np.asarray(source, dtype=np.float64)
+    tgt = np.asarray(target, dtype=np.float64)
+    order = np.argsort(src, kind="stable")
+    src_sorted = src[order]
+    weights = np.zeros((len(src), len(tgt)), dtype=np.float64)
+    columns = np.arange(len(tgt))
+
+    if len(src) == 1:
+        weights[0, :] = 1.0
+    elif method == ResamplingMethod.Nearest:
+        pos = _nearest_sorted(src_sorted, tgt)
+        weights[order[pos], columns] = 1.0
+    elif method == ResamplingMethod.Linear:
+        # values outside the source range are clamped to the outermost band,
+        # the same way np.interp extrapolates
+        clamped = np.clip(tgt, src_sorted[0], src_sorted[-1])
+        upper = np.clip(np.searchsorted(src_sorted, clamped, side="right"), 1, len(src) - 1)
+        lower = upper - 1
+        span = src_sorted[upper] - src_sorted[lower]
+        frac = np.divide(clamped - src_sorted[lower], span,
+                         out=np.zeros_like(span), where=span > 0)
+        weights[order[lower], columns] += 1.0 - frac
+        weights[order[upper], columns] += frac
+    elif method == ResamplingMethod.Gaussian:
+        if fwhm is None:
+            fwhm = float(np.median(np.diff(np.sort(tgt)))) if len(tgt) > 1 else 1.0
+        sigma = fwhm * _FWHM_TO_SIGMA
+        weights = np.exp(-0.5 * ((src[:, None] - tgt[None, :]) / sigma) ** 2)
+        norm = weights.sum(axis=0)
+        if np.any(norm == 0):
+            raise ValueError(
+                "Target wavelengths lie outside the spectral response of the source bands.")
+        weights /= norm
+    else:
+        raise ValueError("Unknown resampling method {}.".format(method))
+
+    weights = weights.astype(dtype)
+    weights.flags.writeable = False
+    return weights
+
+
+class SpectralResampler(object):
+    """
+    Resamples cubes onto a fixed target wavelength grid.
+
+    The weight matrix for every source grid is computed once and cached,
+    resampling itself is a single matrix product over all pixels.
+
+    Example:
+        resampler = SpectralResampler(range(450, 851, 10), ResamplingMethod.Linear)
+        common = resampler.apply(mesu.cube)
+        batch = resampler.apply([cube_a, cube_b])
+    """
+
+    def __init__(self, target_wavelength: Sequence[float],
+                 method: ResamplingMethod = ResamplingMethod.Linear,
+                 fwhm: Optional[float] = None):
+        self._target = tuple(float(w) for w in target_wavelength)
+        if len(self._target) == 0:
+            raise ValueError("Target wavelength grid is empty.")
+        self._method = method
+        self._fwhm = fwhm
+
+    @property
+    def target_wavelength(self) -> np.ndarray:
+        return np.asarray(self._target)
+
+    @property
+    def method(self) -> ResamplingMethod:
+        return self._method
+
+    def weights(self, source_wavelength: Sequence[float], dtype=np.float64) -> np.ndarray:
+        """
+        Returns the cached (source channels x target channels) weight matrix.
+        """
+        source = tuple(float(w) for w in source_wavelength)
+        if len(source) == 0:
+            raise ValueError("Source wavelength grid is empty.")
+        return _resampling_matrix(source, self._target, self._method, self._fwhm,
+                                  np.dtype(dtype).str)
+
+    def apply(self, cube: Union[ImageData, np.ndarray, Sequence[ImageData]],
+              source_wavelength: Optional[Sequence[float]] = None,
+              out: Optional[np.ndarray] = None):
+        """
+        Resamples a cube onto the target grid.
+
+        Accepts an ImageData, a list of ImageData or a NumPy array with the
+        spectral axis last (in which case `source_wavelength` is required).
+        ImageData inputs return ImageData, arrays return arrays.
+        """
+        if isinstance(cube, ImageData):
+            wavelength = cube.wavelength if source_wavelength is None else source_wavelength
+            if wavelength is None:
+                raise ValueError("Wavelength data is not available.")
+            array = self._resample_array(cube.array, wavelength, out)
+            return ImageData.from_array(array, width=array.shape[1], height=array.shape[0],
+                                        channels=array.shape[2], wavelength=self._target)
+        if isinstance(cube, np.ndarray):
+            if source_wavelength is None:
+                raise ValueError("Resampling an array requires the source wavelengths.")
+            return self._resample_array(cube, source_wavelength, out)
+        if out is not None:
+            raise ValueError("'out' is not supported for lists of cubes.")
+        return [self.apply(c, source_wavelength) for c in cube]
+
+    def _resample_array(self, array: np.ndarray, source_wavelength, out: Optional[np.ndarray]) -> np.ndarray:
+        dtype = np.float64 if array.dtype == np.float64 else np.float32
+        matrix = self.weights(source_wavelength, dtype)
+        if array.shape[-1] != matrix.shape[0]:
+            raise ValueError("Cube has {} channels, but {} source wavelengths were given.".format(
+                array.shape[-1], matrix.shape[0]))
+        if array.dtype != dtype:
+            array = array.astype(dtype)
+        return np.matmul(array, matrix, out=out)
@@ -0,0 +1,191 @@
+from .cube_utils import ImageData
+from .cuvis_types import ResamplingMethod, SpectralMetric
+from .resampling import SpectralResampler
+
+import threading
+import numpy as np
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+# pixels scored at once, bounds the (pixels x references) score matrix
+_BLOCK_PIXELS = 1 << 15
+_EPS = 1e-12
+
+
+@dataclass(frozen=True)
+class SpectralLibrary(object):
+    spectra: np.ndarray  # (references, channels)
+    wavelength: np.ndarray
+    names: Optional[tuple[str, ...]] = None
+
+    def __post_init__(self):
+        spectra = np.atleast_2d(np.asarray(self.spectra, dtype=np.float64))
+        wavelength = np.asarray(self.wavelength, dtype=np.float64)
+        if spectra.shape[1] != len(wavelength):
+            raise ValueError("Library spectra have {} channels, but {} wavelengths were given.".format(
+                spectra.shape[1], len(wavelength)))
+        if self.names is not None and len(self.names) != len(spectra):
+            raise ValueError("Number of names does not match the number of spectra.")
+        object.__setattr__(self, "spectra", spectra)
+        object.__setattr__(self, "wavelength", wavelength)
+        if self.names is not None:
+            object.__setattr__(self, "names", tuple(self.names))
+
+    def __len__(self):
+        return len(self.spectra)
+
+
+@dataclass(frozen=True)
+class MatchResult(object):
+    labels: np.ndarray  # (height, width) index into the library, -1 if rejected
+    scores: np.ndarray  # (height, width) score of the best match
+    metric: SpectralMetric
+    names: Optional[tuple[str, ...]] = None
+
+
+@dataclass(frozen=True)
+class _PreparedLibrary(object):
+    references: np.ndarray  # (channels, references), metric specific normalization
+    offsets: Optional[np.ndarray]  # per reference term for SID
+
+
+class SpectralMatcher(object):
+    """
+    Matches every pixel of a cube against a spectral library.
+
+    The library is resampled to the cube's wavelength grid and normalized
+    once per grid, the last `max_cached` grids are kept. Scores are computed
+    as matrix products over blocks of pixels, so memory stays bounded by the
+    block size.
+
+    Scores are the spectral angle in radians (SAM), the spectral information
+    divergence (SID), both lower is better, or the Pearson correlation
+    coefficient (Correlation), higher is better.
+
+    Example:
+        matcher = SpectralMatcher(SpectralLibrary(spectra, wavelength, names))
+        result = matcher.match(mesu.cube)
+    """
+
+    def __init__(self, library: SpectralLibrary, metric: SpectralMetric = SpectralMetric.SAM,
+                 block_pixels: int = _BLOCK_PIXELS, dtype=np.float32, max_cached: int = 8):
+        self._library = library
+        self._metric = metric
+        self._block_pixels = block_pixels
+        self._dtype = np.dtype(dtype)
+        self._prepared = OrderedDict()
+        self._max_cached = max_cached
+        self._lock = threading.Lock()
+
+    @property
+    def library(self) -> SpectralLibrary:
+        return self._library
+
+    @property
+    def metric(self) -> SpectralMetric:
+        return self._metric
+
+    def _prepare(self, wavelength) -> _PreparedLibrary:
+        key = tuple(float(w) for w in wavelength)
+        with self._lock:
+            prepared = self._prepared.get(key)
+            if prepared is not None:
+                self._prepared.move_to_end(key)
+                return prepared
+
+        refs = self._library.spectra
+        if not np.array_equal(self._library.wavelength, key):
+            refs = SpectralResampler(key, ResamplingMethod.Linear).apply(
+                refs, source_wavelength=self._library.wavelength)
+        offsets = None
+        if self._metric == SpectralMetric.SAM:
+            refs = refs / np.maximum(np.linalg.norm(refs, axis=1, keepdims=True), _EPS)
+        elif self._metric == SpectralMetric.Correlation:
+            refs = refs - refs.mean(axis=1, keepdims=True)
+            refs = refs / np.maximum(np.linalg.norm(refs, axis=1, keepdims=True), _EPS)
+        elif self._metric == SpectralMetric.SID:
+            q = np.maximum(refs, _EPS)
+            q = q / q.sum(axis=1, keepdims=True)
+            log_q = np.log(q)
+            offsets = (q * log_q).sum(axis=1).astype(self._dtype)
+            # stacked so that one product yields both cross terms
+            refs = np.concatenate([log_q, q], axis=1)
+        else:
+            raise ValueError("Unknown spectral metric {}.".format(self._metric))
+
+        prepared = _PreparedLibrary(np.ascontiguousarray(refs.T, dtype=self._dtype), offsets)
+        with self._lock:
+            self._prepared[key] = prepared
+            while len(self._prepared) > self._max_cached:
+                self._prepared.popitem(last=False)
+        return prepared
+
+    def _score_block(self, pixels: np.ndarray, prepared: _PreparedLibrary) -> np.ndarray:
+        if self._metric == SpectralMetric.SAM:
+            norms = np.maximum(np.linalg.norm(pixels, axis=1, keepdims=True), _EPS)
+            return pixels @ prepared.references / norms
+        if self._metric == SpectralMetric.Correlation:
+            pixels = pixels - pixels.mean(axis=1, keepdims=True)
+            norms = np.maximum(np.linalg.norm(pixels, axis=1, keepdims=True), _EPS)
+            return pixels @ prepared.references / norms
+        p = np.maximum(pixels, _EPS)
+        p /= p.sum(axis=1, keepdims=True)
+        log_p = np.log(p)
+        # SID = sum(p log p) + sum(q log q) - p . log q - log p . q
+        channels = p.shape[1]
+        cross = p @ prepared.references[:channels] + log_p @ prepared.references[channels:]
+        return (p * log_p).sum(axis=1, keepdims=True) + prepared.offsets - cross
+
+    def scores(self, cube: ImageData) -> np.ndarray:
+        """
+        Returns the (height, width, references) matrix of raw scores.
+        For SAM these are cosines, all other metrics as described above.
+        """
+        prepared = self._prepare(self._check_cube(cube))
+        height, width, channels = cube.array.shape
+        pixels = cube.array.reshape(-1, channels)
+        out = np.empty((len(pixels), len(self._library)), dtype=self._dtype)
+        for start in range(0, len(pixels), self._block_pixels):
+            block = pixels[start:start + self._block_pixels].astype(self._dtype)
+            out[start:start + len(block)] = self._score_block(block, prepared)
+        return out.reshape(height, width, -1)
+
+    def match(self, cube: ImageData, threshold: Optional[float] = None) -> MatchResult:
+        """
+        Returns the best matching reference and its score for every pixel.
+
+        Pixels whose best score is worse than `threshold` (an angle in
+        radians for SAM) get the label -1.
+        """
+        prepared = self._prepare(self._check_cube(cube))
+        height, width, channels = cube.array.shape
+        pixels = cube.array.reshape(-1, channels)
+        labels = np.empty(len(pixels), dtype=np.intp)
+        best = np.empty(len(pixels), dtype=self._dtype)
+        lower_is_better = self._metric == SpectralMetric.SID
+        for start in range(0, len(pixels), self._block_pixels):
+            block = pixels[start:start + self._block_pixels].astype(self._dtype)
+            scores = self._score_block(block, prepared)
+            idx = scores.argmin(axis=1) if lower_is_better else scores.argmax(axis=1)
+            labels[start:start + len(block)] = idx
+            best[start:start + len(block)] = np.take_along_axis(scores, idx[:, None], axis=1)[:, 0]
+
+        if self._metric == SpectralMetric.SAM:
+            best = np.arccos(np.clip(best, -1.0, 1.0, out=best), out=best)
+            lower_is_better = True
+        if threshold is not None:
+            rejected = best > threshold if lower_is_better else best < threshold
+            labels[rejected] = -1
+        return MatchResult(labels=labels.reshape(height, width),
+                           scores=best.reshape(height, width),
+                           metric=self._metric,
+                           names=self._library.names)
+
+    def _check_cube(self, cube: ImageData):
+        if cube.array is None or cube.array.ndim != 3:
+            raise ValueError("Spectral matching requires a three-dimensional cube.")
+        if cube.wavelength is None:
+            raise ValueError("Wavelength data is not available.")
+        return cube.wavelength
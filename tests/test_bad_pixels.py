@@ -0,0 +1,80 @@
+"""
+Tests for cuvis.bad_pixels module.
+
+Detects and repairs synthetic defects in dark and flat frames.
+"""
+
+import pytest
+import numpy as np
+import cuvis
+
+
+@pytest.fixture
+def frames():
+    """Noisy dark and flat frames with a hot, a dead and a stuck pixel."""
+    rng = np.random.default_rng(3)
+    darks = [rng.normal(100, 2, size=(8, 9, 4)) for _ in range(3)]
+    flats = [rng.normal(1000, 5, size=(8, 9, 4)) for _ in range(3)]
+    for d in darks:
+        d[1, 1] = 900  # hot
+    for f in flats:
+        f[4, 4] = 110  # dead
+        f[6, 7] = 1000  # stuck
+    return darks, flats
+
+
+def test_detection(frames):
+    """Test hot, dead and stuck pixels are flagged."""
+    darks, flats = frames
+    bpm = cuvis.BadPixelMap.from_references(darks, flats, calibration_id="calib-1")
+    assert bpm.mask[1, 1] and bpm.mask[4, 4] and bpm.mask[6, 7]
+    assert bpm.count == 3
+
+
+def test_detection_of_quantized_darks():
+    """Test single counts of noise in integer darks are not flagged."""
+    rng = np.random.default_rng(5)
+    dark = (rng.random((50, 50, 1)) < 0.2).astype(np.uint16)
+    dark[7, 9] = 900
+    bpm = cuvis.BadPixelMap.from_references([dark])
+    assert bpm.mask[7, 9]
+    assert bpm.count == 1
+
+
+def test_correction_uses_neighbour_mean():
+    """Test bad pixels are replaced by the mean of good neighbours."""
+    mask = np.zeros((4, 4), dtype=bool)
+    mask[0, 0] = mask[0, 1] = True
+    cube = np.arange(4 * 4 * 2, dtype=np.float32).reshape(4, 4, 2)
+    fixed = cuvis.BadPixelMap(mask).apply(cube)
+    np.testing.assert_allclose(fixed[0, 0], cube[1, :2].mean(axis=0))
+    np.testing.assert_allclose(fixed[0, 1], cube[[0, 1, 1, 1], [2, 0, 1, 2]].mean(axis=0))
+    np.testing.assert_array_equal(fixed[2:], cube[2:])
+    assert not np.shares_memory(fixed, cube)
+
+
+def test_correction_of_views():
+    """Test repairs reach non-contiguous views and strided outputs."""
+    mask = np.zeros((3, 3), dtype=bool)
+    mask[1, 1] = True
+    bpm = cuvis.BadPixelMap(mask)
+    cube = np.arange(5 * 5 * 2, dtype=np.float64).reshape(5, 5, 2)
+    expected = np.delete(cube[1:4, 1:4].reshape(9, 2), 4, axis=0).mean(axis=0)
+    view = cube[1:4, 1:4]
+    assert bpm.apply(view, in_place=True) is view
+    np.testing.assert_allclose(cube[2, 2], expected)
+    out = np.zeros((3, 6, 2))[:, ::2]
+    bpm.apply(np.ascontiguousarray(view), out=out)
+    np.testing.assert_allclose(out[1, 1], expected)
+
+
+def test_store_roundtrip(tmp_path):
+    """Test maps are persisted per calibration id."""
+    mask = np.zeros((3, 3), dtype=bool)
+    mask[1, 1] = True
+    store = cuvis.BadPixelStore(tmp_path)
+    store.put(cuvis.BadPixelMap(mask, calibration_id="abc/1"))
+    loaded = cuvis.BadPixelStore(tmp_path).get("abc/1")
+    assert loaded.calibration_id == "abc/1"
+    np.testing.assert_array_equal(loaded.mask, mask)
+    assert "missing" not in store
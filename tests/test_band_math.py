@@ -0,0 +1,65 @@
+"""
+Tests for cuvis.band_math module.
+
+Covers compiling and evaluating spectral index expressions on synthetic cubes.
+"""
+
+import pytest
+import numpy as np
+import cuvis
+
+
+@pytest.fixture
+def index_cube():
+    """Random cube with bands at 500, 670 and 800 nm."""
+    rng = np.random.default_rng(0)
+    array = rng.integers(1, 1000, size=(6, 7, 3)).astype(np.uint16)
+    return cuvis.ImageData.from_array(
+        array, width=7, height=6, channels=3, wavelength=[500, 670, 800]
+    )
+
+
+def test_ndvi(index_cube):
+    """Test an NDVI expression matches the NumPy reference."""
+    ndvi = index_cube.band_math("(b800 - b670) / (b800 + b670)")
+    nir = index_cube.array[:, :, 2].astype(np.float32)
+    red = index_cube.array[:, :, 1].astype(np.float32)
+    np.testing.assert_allclose(ndvi, (nir - red) / (nir + red), rtol=1e-6)
+    assert ndvi.dtype == np.float32
+
+
+def test_bands_resolve_to_nearest(index_cube):
+    """Test band references resolve to the nearest wavelength."""
+    result = index_cube.band_math("b805 * 2 + 1")
+    np.testing.assert_allclose(result, index_cube.array[:, :, 2] * 2.0 + 1)
+    with pytest.raises(ValueError):
+        index_cube.band_math("b900", tolerance=10)
+
+
+def test_multiple_indices_with_out(index_cube):
+    """Test several indices are evaluated in one pass into given buffers."""
+    out = {"ratio": np.empty((6, 7), dtype=np.float32)}
+    results = index_cube.band_math(
+        {"ratio": "b800 / b500", "diff": "sqrt(abs(b800 - b500))"}, out=out)
+    assert results["ratio"] is out["ratio"]
+    np.testing.assert_allclose(
+        results["diff"],
+        np.sqrt(np.abs(index_cube.array[:, :, 2].astype(np.float32)
+                       - index_cube.array[:, :, 0])))
+
+
+def test_plan_is_cached(index_cube):
+    """Test compiled plans are shared and bands are loaded once."""
+    expressions = {"a": "b800 - b670", "b": "b800 + b670"}
+    first = cuvis.compile_band_math(expressions, index_cube.wavelength)
+    second = cuvis.compile_band_math(expressions, list(index_cube.wavelength))
+    assert first is second
+    assert sorted(first.bands) == [1, 2]
+
+
+def test_invalid_expression(index_cube):
+    """Test unsupported syntax is rejected."""
+    with pytest.raises(ValueError):
+        index_cube.band_math("__import__('os')")
+    with pytest.raises(ValueError):
+        index_cube.band_math("b800 +")
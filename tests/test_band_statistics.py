@@ -0,0 +1,62 @@
+"""
+Tests for cuvis.band_statistics module.
+
+Compares streaming per-band statistics against NumPy on synthetic cubes.
+"""
+
+import pytest
+import numpy as np
+import cuvis
+
+
+@pytest.fixture
+def cubes():
+    """Three random cubes sharing one wavelength grid."""
+    rng = np.random.default_rng(1)
+    return [
+        cuvis.ImageData.from_array(
+            rng.normal(100, 10, size=(5, 4, 3)).astype(np.float32),
+            width=4, height=5, channels=3, wavelength=[500, 600, 700])
+        for _ in range(3)
+    ]
+
+
+def _stacked(cubes):
+    return np.concatenate([c.array.reshape(-1, 3) for c in cubes]).astype(np.float64)
+
+
+def test_streaming_statistics(cubes):
+    """Test statistics over several cubes match the stacked reference."""
+    result = cuvis.BandStatistics(covariance=True).consume(cubes).finalize(ddof=1)
+    pixels = _stacked(cubes)
+    assert result.count == len(pixels)
+    np.testing.assert_allclose(result.mean, pixels.mean(axis=0))
+    np.testing.assert_allclose(result.variance, pixels.var(axis=0, ddof=1))
+    np.testing.assert_allclose(result.min, pixels.min(axis=0))
+    np.testing.assert_allclose(result.max, pixels.max(axis=0))
+    np.testing.assert_allclose(result.covariance, np.cov(pixels, rowvar=False))
+    assert result.wavelength.tolist() == [500, 600, 700]
+
+
+def test_merge_matches_single_pass(cubes):
+    """Test merging partial accumulators equals a single accumulator."""
+    first = cuvis.BandStatistics(covariance=True).consume(cubes[:1])
+    second = cuvis.BandStatistics(covariance=True).consume(cubes[1:])
+    merged = first.merge(second).finalize()
+    single = cuvis.BandStatistics(covariance=True).consume(cubes).finalize()
+    np.testing.assert_allclose(merged.mean, single.mean)
+    np.testing.assert_allclose(merged.variance, single.variance)
+    np.testing.assert_allclose(merged.covariance, single.covariance)
+
+
+def test_mismatching_bands_rejected(cubes):
+    """Test cubes with a different band count are rejected."""
+    stats = cuvis.BandStatistics().consume(cubes)
+    with pytest.raises(ValueError):
+        stats.update(np.zeros((2, 2, 4)))
+
+
+def test_session_statistics(test_session_file):
+    """Test statistics can be gathered by iterating a SessionFile."""
+    result = cuvis.BandStatistics().consume(test_session_file).finalize()
+    assert result.count > 0
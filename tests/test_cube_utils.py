@@ -0,0 +1,313 @@
+"""
+Tests for cuvis.cube_utils module.
+
+Covers the ImageData container independently of the SDK by constructing
+instances from NumPy arrays.
+"""
+
+import sys
+import pytest
+import numpy as np
+import cuvis
+
+
+@pytest.fixture
+def synthetic_cube():
+    """Small synthetic cube with a regular 10 nm wavelength grid."""
+    array = np.arange(4 * 5 * 6, dtype=np.uint16).reshape(4, 5, 6)
+    wavelength = [450, 460, 470, 480, 490, 500]
+    return cuvis.ImageData.from_array(
+        array, width=5, height=4, channels=6, wavelength=wavelength
+    )
+
+
+def test_wavelength_is_readonly_array(synthetic_cube):
+    """Test wavelength is exposed as a read-only NumPy array."""
+    wl = synthetic_cube.wavelength
+    assert isinstance(wl, np.ndarray)
+    assert not wl.flags.writeable
+    assert wl.tolist() == [450, 460, 470, 480, 490, 500]
+
+
+def test_wavelength_is_shared(synthetic_cube):
+    """Test identical wavelength grids share a single array."""
+    other = cuvis.ImageData.from_array(
+        np.zeros((4, 5, 6)), width=5, height=4, channels=6,
+        wavelength=list(synthetic_cube.wavelength)
+    )
+    assert other.wavelength is synthetic_cube.wavelength
+
+
+def test_getitem_band_slice_with_step(synthetic_cube):
+    """Test band slicing honours steps and negative indices."""
+    sub = synthetic_cube[:, :, ::2]
+    assert sub.wavelength.tolist() == [450, 470, 490]
+    assert np.shares_memory(sub.array, synthetic_cube.array)
+    last = synthetic_cube[:, :, -2:]
+    assert last.wavelength.tolist() == [490, 500]
+
+
+def test_getitem_band_slice_with_ellipsis(synthetic_cube):
+    """Test band slices behind an Ellipsis select the matching wavelengths."""
+    sub = synthetic_cube[..., 2:4]
+    assert sub.array.shape == (4, 5, 2)
+    assert sub.wavelength.tolist() == [470, 480]
+    rows = synthetic_cube[1:3, ..., ::3]
+    assert rows.array.shape == (2, 5, 2)
+    assert rows.wavelength.tolist() == [450, 480]
+    assert synthetic_cube[1:3, ...].wavelength.tolist() == synthetic_cube.wavelength.tolist()
+    band = synthetic_cube[1:3, ..., 4]
+    np.testing.assert_array_equal(band, synthetic_cube.array[1:3, :, 4])
+
+
+def test_getitem_pixel_spectrum(synthetic_cube):
+    """Test single pixel access returns spectrum and wavelengths."""
+    spectrum, wl = synthetic_cube[1, 2]
+    assert spectrum.shape == (6,)
+    assert wl.tolist() == synthetic_cube.wavelength.tolist()
+
+
+def test_getitem_scalar(synthetic_cube):
+    """Test indexing all three axes returns the single value."""
+    assert synthetic_cube[1, 2, 3] == synthetic_cube.array[1, 2, 3]
+
+
+def test_getitem_spatial_mask_band(synthetic_cube):
+    """Test a 2-D mask with a band index selects that band's wavelength."""
+    mask = synthetic_cube.array[:, :, 0] % 4 == 0
+    values, wl = synthetic_cube[mask, 3]
+    np.testing.assert_array_equal(values, synthetic_cube.array[mask, 3])
+    assert wl.tolist() == [480]
+    spectra = synthetic_cube[mask]
+    assert spectra.shape == (mask.sum(), 6)
+    full_mask = synthetic_cube.array % 7 == 0
+    values, wl = synthetic_cube[full_mask]
+    assert wl.tolist() == [synthetic_cube.wavelength[b] for b in np.nonzero(full_mask)[2]]
+
+
+def test_band_index_nearest(synthetic_cube):
+    """Test nearest band lookup by wavelength."""
+    assert synthetic_cube.band_index(463) == 1
+    assert synthetic_cube.band_index(1000) == 5
+    assert synthetic_cube.band_index([449, 476]).tolist() == [0, 3]
+    with pytest.raises(ValueError):
+        synthetic_cube.band_index(1000, tolerance=5)
+
+
+def test_sel_by_wavelength(synthetic_cube):
+    """Test wavelength-addressed band selection."""
+    band = synthetic_cube.sel(nm=470)
+    assert band.channels == 1
+    assert band.wavelength.tolist() == [470]
+    np.testing.assert_array_equal(band.array[:, :, 0], synthetic_cube.array[:, :, 2])
+
+    bands = synthetic_cube.sel(nm=[450, 470, 490])
+    assert bands.wavelength.tolist() == [450, 470, 490]
+    assert np.shares_memory(bands.array, synthetic_cube.array)
+
+
+def test_sel_by_range(synthetic_cube):
+    """Test wavelength range selection is an inclusive view."""
+    vis = synthetic_cube.sel(range_nm=(455, 480))
+    assert vis.wavelength.tolist() == [460, 470, 480]
+    assert np.shares_memory(vis.array, synthetic_cube.array)
+    with pytest.raises(ValueError):
+        synthetic_cube.sel()
+
+
+def test_iter_tiles_are_views(synthetic_cube):
+    """Test tiles are views carrying offset and wavelength metadata."""
+    tiles = list(synthetic_cube.iter_tiles((2, 3)))
+    assert len(tiles) == 4
+    assert [t.offset for t in tiles] == [(0, 0), (0, 3), (2, 0), (2, 3)]
+    for tile in tiles:
+        assert np.shares_memory(tile.array, synthetic_cube.array)
+        assert tile.wavelength is synthetic_cube.wavelength
+
+
+def test_tiles_roundtrip_with_overlap(synthetic_cube):
+    """Test assembling tiles with overlap reproduces the cube."""
+    tiles = synthetic_cube.iter_tiles(2, overlap=1)
+    out = np.zeros_like(synthetic_cube.array)
+    cuvis.write_tiles(((t, t.array) for t in tiles), out)
+    np.testing.assert_array_equal(out, synthetic_cube.array)
+
+
+def test_map_tiles_thread_pool(synthetic_cube):
+    """Test tile-wise processing on a thread pool."""
+    result = synthetic_cube.map_tiles(
+        lambda t: t.array.sum(axis=2), (3, 2), overlap=1, max_workers=2)
+    np.testing.assert_array_equal(result, synthetic_cube.array.sum(axis=2))
+
+
+def test_numpy_conversion_is_zero_copy(synthetic_cube):
+    """Test np.asarray and the array interface share memory."""
+    assert np.shares_memory(np.asarray(synthetic_cube), synthetic_cube.array)
+    assert np.shares_memory(np.array(synthetic_cube, copy=False), synthetic_cube.array)
+    assert not np.shares_memory(np.array(synthetic_cube, copy=True), synthetic_cube.array)
+    assert np.asarray(synthetic_cube, dtype=np.float32).dtype == np.float32
+
+
+def test_dlpack_export(synthetic_cube):
+    """Test DLPack consumers see the same memory."""
+    exported = np.from_dlpack(synthetic_cube)
+    assert np.shares_memory(exported, synthetic_cube.array)
+
+
+@pytest.mark.skipif(sys.version_info < (3, 12), reason="buffer protocol needs PEP 688")
+def test_memoryview_export(synthetic_cube):
+    """Test memoryview exposes the image memory."""
+    view = memoryview(synthetic_cube)
+    assert view.shape == synthetic_cube.array.shape
+
+
+def test_detach_into_buffer(synthetic_cube):
+    """Test detaching copies SDK-backed data into the given buffer."""
+    assert synthetic_cube.owns_data
+    synthetic_cube._img_buf = object()  # pretend the data is SDK memory
+    original = synthetic_cube.array
+    out = np.empty_like(original)
+    assert synthetic_cube.detach(out=out) is synthetic_cube
+    assert synthetic_cube.owns_data
+    assert synthetic_cube.array is out
+    np.testing.assert_array_equal(out, original)
+
+
+def test_astype_with_scale_and_offset(synthetic_cube):
+    """Test dtype conversion with scaling."""
+    converted = synthetic_cube.astype(np.float32, scale=0.5, offset=1)
+    assert converted.dtype == np.float32
+    assert converted.wavelength is synthetic_cube.wavelength
+    np.testing.assert_allclose(converted.array, synthetic_cube.array * 0.5 + 1)
+
+
+def test_astype_integer_target_rounds_once():
+    """Test integer conversion rounds scale and offset together and clips."""
+    img = cuvis.ImageData.from_array(np.array([[[1, 3, 60000]]], dtype=np.uint16),
+                                     width=1, height=1, channels=3)
+    converted = img.astype(np.uint16, scale=0.5, offset=0.5)
+    assert converted.array.ravel().tolist() == [1, 2, 30000]
+    clipped = img.astype(np.int8, scale=1, offset=-2)
+    assert clipped.array.ravel().tolist() == [-1, 1, 127]
+
+
+def test_astype_reuses_pooled_buffers(synthetic_cube):
+    """Test conversions reuse arrays handed back to the pool."""
+    pool = cuvis.BufferPool()
+    first = synthetic_cube.astype(np.float32, scale=2, pool=pool)
+    buffer = first.array
+    pool.release(buffer)
+    assert len(pool) == 1
+    second = synthetic_cube.astype(np.float32, scale=2, pool=pool)
+    assert second.array is buffer
+    assert len(pool) == 0
+    with pytest.raises(ValueError):
+        synthetic_cube.astype(np.float32, out=np.empty((1, 1, 1), dtype=np.float32))
+
+
+def test_pyramid_block_average():
+    """Test pyramid levels are 2x2 block means and are cached."""
+    array = np.arange(8 * 6 * 2, dtype=np.float32).reshape(8, 6, 2)
+    img = cuvis.ImageData.from_array(array, width=6, height=8, channels=2)
+    levels = img.pyramid(3)
+    assert [lvl.array.shape for lvl in levels] == [(8, 6, 2), (4, 3, 2), (2, 1, 2)]
+    np.testing.assert_allclose(levels[1].array[0, 0], array[:2, :2].mean(axis=(0, 1)))
+    assert img.pyramid(2)[1] is levels[1]
+
+
+def test_pyramid_keeps_precision_of_wide_types():
+    """Test 32 bit integer levels are averaged without float32 rounding."""
+    array = np.full((2, 2, 1), 2 ** 31 + 1, dtype=np.uint32)
+    level = cuvis.ImageData.from_array(array, width=2, height=2, channels=1).pyramid(2)[1]
+    assert level.array.dtype == np.uint32
+    assert int(level.array[0, 0, 0]) == 2 ** 31 + 1
+
+
+def test_preview_size(synthetic_cube):
+    """Test preview returns the coarsest level covering the requested size."""
+    assert synthetic_cube.preview(5) is synthetic_cube
+    small = synthetic_cube.preview(2)
+    assert small.array.shape[:2] == (2, 2)
+    assert small.array.dtype == synthetic_cube.array.dtype
+
+
+def test_roi_spectra_matches_masks(synthetic_cube):
+    """Test per-label spectra match boolean mask reductions."""
+    labels = np.zeros((4, 5), dtype=np.int32)
+    labels[:2, :2] = 3
+    labels[2:, 3:] = 7
+    rois = synthetic_cube.roi_spectra(labels, ignore_label=0)
+    assert rois.labels.tolist() == [3, 7]
+    for label in (3, 7):
+        mean, std, count = rois[label]
+        pixels = synthetic_cube.array[labels == label].astype(np.float64)
+        assert count == len(pixels)
+        np.testing.assert_allclose(mean, pixels.mean(axis=0))
+        np.testing.assert_allclose(std, pixels.std(axis=0), atol=1e-9)
+
+
+def test_roi_spectra_sparse_labels(synthetic_cube):
+    """Test negative and large label values are handled."""
+    labels = np.full((4, 5), -5, dtype=np.int64)
+    labels[0, 0] = 10 ** 9
+    rois = synthetic_cube.roi_spectra(labels)
+    assert rois.labels.tolist() == [-5, 10 ** 9]
+    assert rois.count.tolist() == [19, 1]
+    np.testing.assert_allclose(rois[10 ** 9][0], synthetic_cube.array[0, 0])
+
+
+def test_interleave_views_share_memory(synthetic_cube):
+    """Test BIL and BSQ views are zero-copy transpositions of the cube."""
+    bil = synthetic_cube.interleave(cuvis.Interleave.BIL)
+    bsq = synthetic_cube.interleave(cuvis.Interleave.BSQ)
+    assert bil.shape == (4, 6, 5)
+    assert bsq.shape == (6, 4, 5)
+    assert np.shares_memory(bsq, synthetic_cube.array)
+    np.testing.assert_array_equal(bsq[2], synthetic_cube.array[:, :, 2])
+    np.testing.assert_array_equal(bil[1, 3], synthetic_cube.array[1, :, 3])
+
+
+def test_contiguous_copies_only_when_needed(synthetic_cube):
+    """Test contiguous returns BIP as is and materializes BSQ into the pool."""
+    pool = cuvis.BufferPool()
+    bip = synthetic_cube.contiguous(cuvis.Interleave.BIP, pool=pool)
+    assert np.shares_memory(bip, synthetic_cube.array)
+    bsq = synthetic_cube.contiguous(cuvis.Interleave.BSQ, pool=pool)
+    assert bsq.flags.c_contiguous
+    assert not np.shares_memory(bsq, synthetic_cube.array)
+    np.testing.assert_array_equal(bsq, synthetic_cube.array.transpose(2, 0, 1))
+
+
+def test_save_envi_writes_layout(synthetic_cube, tmp_path):
+    """Test ENVI export writes raw data in the requested interleave."""
+    header = synthetic_cube.save_envi(tmp_path / "cube", cuvis.Interleave.BIL)
+    text = header.read_text()
+    assert "interleave = bil" in text
+    assert "data type = 12" in text
+    assert "bands = 6" in text
+    raw = np.fromfile(tmp_path / "cube.raw", dtype=np.uint16).reshape(4, 6, 5)
+    np.testing.assert_array_equal(raw, synthetic_cube.array.transpose(0, 2, 1))
+
+
+def test_shared_roundtrip(synthetic_cube):
+    """Test an image attached from shared memory matches the original."""
+    with synthetic_cube.to_shared() as shared:
+        attached = cuvis.ImageData.from_shared(shared.name)
+        np.testing.assert_array_equal(attached.array, synthetic_cube.array)
+        assert attached.wavelength is synthetic_cube.wavelength
+        assert (attached.width, attached.height, attached.channels) == (5, 4, 6)
+        band = attached.array[:, :, 1]
+        del attached
+        # the derived view keeps the mapping alive
+        assert band.sum() == synthetic_cube.array[:, :, 1].sum()
+    assert shared.closed
+
+
+def test_shared_after_close_fails(synthetic_cube):
+    """Test attaching to a closed shared image raises."""
+    shared = synthetic_cube.to_shared()
+    name = shared.name
+    shared.close()
+    shared.close()
+    with pytest.raises(FileNotFoundError):
+        cuvis.ImageData.from_shared(name)
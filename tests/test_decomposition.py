@@ -0,0 +1,58 @@
+"""
+Tests for cuvis.decomposition module.
+
+Fits PCA and MNF incrementally on synthetic low-rank cubes.
+"""
+
+import pytest
+import numpy as np
+import cuvis
+
+
+@pytest.fixture
+def low_rank_cubes():
+    """Cubes spanned by two spectral endmembers plus a little noise."""
+    rng = np.random.default_rng(2)
+    endmembers = rng.uniform(0.5, 1.5, size=(2, 12))
+    cubes = []
+    for _ in range(4):
+        abundances = rng.uniform(0, 1, size=(10, 8, 2))
+        array = abundances @ endmembers + rng.normal(0, 1e-3, size=(10, 8, 12))
+        cubes.append(cuvis.ImageData.from_array(
+            array.astype(np.float32), width=8, height=10, channels=12,
+            wavelength=np.arange(400, 520, 10)))
+    return cubes
+
+
+def test_pca_matches_batch_solution(low_rank_cubes):
+    """Test incremental PCA agrees with a PCA of the stacked pixels."""
+    pca = cuvis.PCA(n_components=2).fit(low_rank_cubes)
+    pixels = np.concatenate([c.array.reshape(-1, 12) for c in low_rank_cubes]).astype(np.float64)
+    eigenvalues = np.linalg.eigvalsh(np.cov(pixels, rowvar=False))[::-1]
+    np.testing.assert_allclose(pca.explained_variance, eigenvalues[:2], rtol=1e-5)
+    assert pca.explained_variance_ratio.sum() > 0.99
+
+
+def test_pca_transform_roundtrip(low_rank_cubes):
+    """Test projecting and reconstructing a low-rank cube."""
+    pca = cuvis.PCA(n_components=2, sample_pixels=30, random_state=0).fit(low_rank_cubes)
+    reduced = pca.transform(low_rank_cubes[0])
+    assert reduced.array.shape == (10, 8, 2)
+    restored = pca.inverse_transform(reduced)
+    np.testing.assert_allclose(restored, low_rank_cubes[0].array, atol=1e-2)
+
+
+def test_mnf_transform(low_rank_cubes):
+    """Test MNF fits and projects onto the requested number of components."""
+    mnf = cuvis.MNF(n_components=3)
+    for cube in low_rank_cubes:
+        mnf.partial_fit(cube)
+    reduced = mnf.transform(low_rank_cubes[1].array)
+    assert reduced.shape == (10, 8, 3)
+    assert mnf.explained_variance[0] >= mnf.explained_variance[-1]
+
+
+def test_unfitted_raises():
+    """Test using an unfitted estimator raises."""
+    with pytest.raises(ValueError):
+        cuvis.PCA(n_components=1).components
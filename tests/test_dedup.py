@@ -0,0 +1,47 @@
+"""
+Tests for content fingerprints and cuvis.dedup module.
+"""
+
+import numpy as np
+import cuvis
+
+
+def _cube(value=0):
+    array = np.arange(8 * 9 * 4, dtype=np.uint16).reshape(8, 9, 4) + value
+    return cuvis.ImageData.from_array(array, width=9, height=8, channels=4,
+                                      wavelength=[500, 600, 700, 800])
+
+
+def test_fingerprint_depends_on_content():
+    """Test equal content gives equal and changed content different fingerprints."""
+    assert _cube().fingerprint() == _cube().fingerprint()
+    assert _cube().fingerprint() != _cube(1).fingerprint()
+    assert _cube().fingerprint(samples=5) != _cube(1).fingerprint(samples=5)
+
+
+def test_fingerprint_of_view_matches_copy():
+    """Test a non-contiguous view fingerprints like its contiguous copy."""
+    view = _cube()[1:, ::2]
+    assert not view.array.flags.c_contiguous
+    copy = cuvis.ImageData.from_array(view.array.copy(), width=5, height=7, channels=4,
+                                      wavelength=[500, 600, 700, 800])
+    assert view.fingerprint(samples=7) == copy.fingerprint(samples=7)
+
+
+def test_deduplicator_filters_and_persists(tmp_path):
+    """Test duplicates are skipped within and across runs."""
+    store = tmp_path / "seen.txt"
+    dedup = cuvis.Deduplicator(store)
+    kept = list(dedup.filter([_cube(), _cube(1), _cube()]))
+    assert len(kept) == 2 and len(dedup) == 2
+    again = cuvis.Deduplicator(store)
+    assert _cube(1) in again
+    assert not again.add(_cube())
+    assert again.add(_cube(2))
+
+
+def test_measurement_fingerprint_is_stable(test_session_file):
+    """Test two loads of the same frame share a fingerprint."""
+    first = test_session_file.get_measurement(0)
+    second = test_session_file.get_measurement(0)
+    assert first.fingerprint() == second.fingerprint()
@@ -0,0 +1,66 @@
+"""
+Tests for cuvis.handles module and explicit handle release.
+
+Checks context managers, idempotent close() and the live handle tracker.
+"""
+
+import pytest
+import cuvis
+
+
+@pytest.fixture
+def tracking():
+    """Enable handle tracking for one test."""
+    cuvis.enable_handle_tracking()
+    yield
+    cuvis.enable_handle_tracking(False)
+
+
+def test_tracking_disabled_reports_nothing():
+    """Test no handles are reported while tracking is disabled."""
+    cuvis.enable_handle_tracking(False)
+    assert cuvis.live_handles() == []
+
+
+def test_handle_owner_frees_once(tracking):
+    """Test a handle owner frees its handle once and stops being tracked."""
+    class Owner(cuvis.handles.HandleOwner):
+        def __init__(self):
+            self._handle = 7
+            self.freed = []
+            cuvis.handles._register(self)
+
+        def _free(self, handle):
+            self.freed.append(handle)
+
+    with Owner() as owner:
+        assert [h.handle for h in cuvis.live_handles()] == [7]
+    owner.close()
+    assert owner._handle is None
+    assert owner.freed == [7]
+    assert cuvis.live_handles() == []
+
+
+def test_session_file_context_manager(test_data_dir, sdk_initialized, tracking):
+    """Test a session file is tracked while open and freed on exit."""
+    path = test_data_dir / "test_mesu.cu3s"
+    if not path.exists():
+        pytest.skip(f"Test data not found: {path}")
+    with cuvis.SessionFile(str(path)) as session:
+        assert any(h.kind == "SessionFile" for h in cuvis.live_handles())
+        session.thumbnail
+    assert session._handle is None
+    assert session._thumbnail is None
+    assert all(h.kind != "SessionFile" for h in cuvis.live_handles())
+    session.close()
+
+
+def test_measurement_close_is_idempotent(test_session_file, tracking):
+    """Test an unread measurement reports its native bytes and closes once."""
+    with test_session_file.get_measurement(0) as mesu:
+        assert not mesu.data.is_loaded("cube")
+        live = [h for h in cuvis.live_handles() if h.kind == "Measurement"]
+        assert len(live) == 1 and live[0].native_bytes > 0
+    assert mesu._handle is None
+    mesu.close()
+    assert len(mesu.data) == 0
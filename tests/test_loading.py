@@ -0,0 +1,32 @@
+"""
+Tests for cuvis.loading module.
+
+Covers concurrent loading of many files, ordering and per-file errors.
+"""
+
+import pytest
+import cuvis
+
+
+def test_load_many_reports_errors_per_file(tmp_path):
+    """Test missing files yield errors without aborting the batch."""
+    paths = [tmp_path / "frame_{}.cu3".format(i) for i in range(10)]
+    results = list(cuvis.load_many(paths, max_workers=2))
+    assert sorted(r.path for r in results) == sorted(paths)
+    assert all(not r.ok and isinstance(r.error, FileNotFoundError) for r in results)
+
+
+def test_load_many_input_order(tmp_path):
+    """Test results keep the input order when requested."""
+    paths = [tmp_path / "frame_{}.cu3".format(i) for i in range(7)]
+    results = cuvis.load_many(iter(paths), max_workers=3, ordered=True)
+    assert [r.path for r in results] == paths
+
+
+def test_load_many_session_files(test_data_dir, sdk_initialized):
+    """Test session files are opened as SessionFile."""
+    path = test_data_dir / "test_mesu.cu3s"
+    if not path.exists():
+        pytest.skip(f"Test data not found: {path}")
+    results = list(cuvis.load_many([path, path], max_workers=2))
+    assert all(r.ok and isinstance(r.item, cuvis.SessionFile) for r in results)
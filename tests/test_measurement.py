@@ -85,3 +85,102 @@ def test_measurement_deepcopy(test_measurement):
     # Verify copy has same metadata
     assert copy.capture_time == test_measurement.capture_time
     assert copy.integration_time == test_measurement.integration_time
+
+
+def test_measurement_release_keeps_cube(test_session_file, processing_context_from_session):
+    """Test releasing a measurement keeps a detached cube."""
+    mesu = test_session_file.get_measurement(0)
+    processing_context_from_session.processing_mode = cuvis.ProcessingMode.Raw
+    processing_context_from_session.apply(mesu)
+    expected = mesu.cube.array.copy()
+    serial = mesu.serial_number
+    mesu.release(keep=["cube"])
+    assert list(mesu.data.keys()) == ["cube"]
+    assert mesu.cube.owns_data
+    assert (mesu.cube.array == expected).all()
+    assert mesu.serial_number == serial
+
+
+def test_released_measurement_raises(test_session_file, processing_context_from_session):
+    """Test SDK calls on a released measurement raise a ValueError."""
+    mesu = test_session_file.get_measurement(0)
+    mesu.release()
+    with pytest.raises(ValueError):
+        mesu.capabilities
+    with pytest.raises(ValueError):
+        mesu.refresh()
+    with pytest.raises(ValueError):
+        processing_context_from_session.apply(mesu)
+
+
+def test_measurement_data_is_lazy(test_session_file):
+    """Test data items are enumerated up front and fetched on first access."""
+    mesu = test_session_file.get_measurement(0)
+    assert "cube" in mesu.data
+    assert not mesu.data.is_loaded("cube")
+    cube = mesu.data["cube"]
+    assert isinstance(cube, cuvis.ImageData)
+    assert mesu.data.is_loaded("cube")
+    assert mesu.data["cube"] is cube
+
+
+def test_open_metadata_missing_file(tmp_path):
+    """Test metadata-only open of a missing file raises."""
+    with pytest.raises(FileNotFoundError):
+        cuvis.Measurement.open_metadata(tmp_path / "missing.cu3")
+
+
+def test_metadata_record_matches_measurement(test_measurement):
+    """Test the metadata record holds the measurement's properties."""
+    meta = cuvis.MeasurementMetadata._from_handle(test_measurement._handle)
+    assert meta.serial_number == test_measurement.serial_number
+    assert meta.capture_time == test_measurement.capture_time
+    assert meta.processing_mode == test_measurement.processing_mode
+    with pytest.raises(AttributeError):
+        meta.name = "changed"
+
+
+def test_measurement_key_selection(test_session_file, processing_context_from_session):
+    """Test only data items matching the selected patterns are exposed."""
+    mesu = test_session_file.get_measurement(0, keys={"cube"})
+    assert list(mesu.data.keys()) == ["cube"]
+    processing_context_from_session.processing_mode = cuvis.ProcessingMode.Raw
+    processing_context_from_session.apply(mesu)
+    assert list(mesu.data.keys()) == ["cube"]
+    mesu.refresh(keys={"view_*"})
+    assert "cube" not in mesu.data
+    assert all(key.startswith("view_") for key in mesu.data)
+    assert "cube" in mesu.data.available
+
+
+def test_measurement_refresh_keeps_unchanged_images(test_measurement):
+    """Test a refresh reuses loaded images whose SDK buffer did not change."""
+    cube = test_measurement.data["cube"]
+    test_measurement.refresh()
+    assert test_measurement.data["cube"] is cube
+
+
+def test_key_selection_accepts_single_pattern(test_session_file):
+    """Test a single string selects one pattern, not its characters."""
+    mesu = test_session_file.get_measurement(0, keys="cube")
+    assert list(mesu.data.keys()) == ["cube"]
+
+
+def test_open_metadata_roundtrip(test_measurement, tmp_path):
+    """Test a saved .cu3 file opens as metadata and upgrades to a Measurement."""
+    exporter = cuvis.CubeExporter(
+        cuvis.SaveArgs(export_dir=str(tmp_path), allow_session_file=False))
+    exporter.apply(test_measurement)
+    exporter.flush()
+    exporter.close()
+    files = sorted(tmp_path.rglob("*.cu3"))
+    assert files
+    meta = cuvis.Measurement.open_metadata(files[0])
+    assert isinstance(meta, cuvis.MeasurementMetadata)
+    assert meta.file == files[0]
+    assert meta.serial_number == test_measurement.serial_number
+    assert meta.capture_time == test_measurement.capture_time
+    with meta.open() as mesu:
+        assert isinstance(mesu, cuvis.Measurement)
+        assert mesu.frame_id == meta.frame_id
+        assert "cube" in mesu.data
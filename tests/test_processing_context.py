@@ -123,3 +123,12 @@ def test_cube_wavelength_access(processing_context_from_session, test_measuremen
     assert hasattr(cube, "wavelength")
     wavelength = cube.wavelength
     assert wavelength is not None
+
+
+def test_apply_without_refresh(processing_context_from_session, test_measurement):
+    """Test data is refreshed on next access after apply(refresh=False)."""
+    pc = processing_context_from_session
+    pc.processing_mode = cuvis.ProcessingMode.Raw
+    pc.apply(test_measurement, refresh=False)
+    assert test_measurement.processing_mode == cuvis.ProcessingMode.Raw
+    assert "cube" in test_measurement.data
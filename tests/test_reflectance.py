@@ -0,0 +1,62 @@
+"""
+Tests for cuvis.reflectance module.
+
+Checks NumPy reflectance conversion against the closed-form result.
+"""
+
+import pytest
+import numpy as np
+import cuvis
+
+
+@pytest.fixture
+def references():
+    """Dark and white reference cubes."""
+    dark = np.full((3, 4, 5), 100, dtype=np.uint16)
+    white = np.full((3, 4, 5), 1100, dtype=np.uint16)
+    white[0, 0, 0] = 100  # defective pixel without signal
+    return dark, white
+
+
+def test_reflectance_conversion(references):
+    """Test (raw - dark) / (white - dark) with in-place output."""
+    dark, white = references
+    raw = cuvis.ImageData.from_array(
+        np.full((3, 4, 5), 600, dtype=np.uint16), width=4, height=3, channels=5,
+        wavelength=[500, 550, 600, 650, 700])
+    corrector = cuvis.ReflectanceCorrector()
+    out = np.empty((3, 4, 5), dtype=np.float32)
+    refl = corrector.apply(raw, dark, white, out=out)
+    assert refl.array is out
+    assert refl.wavelength is raw.wavelength
+    assert out[0, 0, 0] == 0
+    np.testing.assert_allclose(out[1:], 0.5)
+
+
+def test_references_are_cached(references):
+    """Test the inverse is computed once per reference pair."""
+    dark, white = references
+    corrector = cuvis.ReflectanceCorrector(scale=100)
+    corrector.set_references(dark, white)
+    first = corrector._prepare(dark, white)
+    results = corrector.apply([np.full((3, 4, 5), 1100), np.full((3, 4, 5), 100)])
+    assert corrector._prepare(dark, white) is first
+    np.testing.assert_allclose(results[0][1:], 100)
+    np.testing.assert_allclose(results[1], 0)
+
+
+def test_missing_references():
+    """Test applying without references raises."""
+    with pytest.raises(ValueError):
+        cuvis.ReflectanceCorrector().apply(np.zeros((1, 1, 1)))
+
+
+def test_reflectance_from_session_references(test_session_file):
+    """Test session dark and white references can be used directly."""
+    dark = test_session_file.get_reference(0, cuvis.ReferenceType.Dark)
+    white = test_session_file.get_reference(0, cuvis.ReferenceType.White)
+    if dark is None or white is None:
+        pytest.skip("Session does not contain dark and white references")
+    mesu = test_session_file.get_measurement(0)
+    refl = cuvis.ReflectanceCorrector().apply(mesu.cube, dark, white)
+    assert refl.array.shape == mesu.cube.array.shape
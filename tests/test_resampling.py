@@ -0,0 +1,62 @@
+"""
+Tests for cuvis.resampling module.
+
+Covers resampling of synthetic cubes onto a different wavelength grid.
+"""
+
+import pytest
+import numpy as np
+import cuvis
+
+
+@pytest.fixture
+def ramp_cube():
+    """Cube whose spectra are linear in wavelength."""
+    wavelength = np.arange(400, 701, 20)
+    array = np.broadcast_to(wavelength * 2.0, (3, 4, len(wavelength))).astype(np.float32)
+    return cuvis.ImageData.from_array(
+        np.ascontiguousarray(array), width=4, height=3,
+        channels=len(wavelength), wavelength=wavelength
+    )
+
+
+def test_linear_resampling_matches_interp(ramp_cube):
+    """Test linear resampling agrees with np.interp."""
+    target = [405, 455.5, 610, 800]
+    resampled = ramp_cube.resample(target)
+    assert resampled.wavelength.tolist() == target
+    expected = np.interp(target, ramp_cube.wavelength, ramp_cube.array[0, 0])
+    np.testing.assert_allclose(resampled.array[1, 2], expected, rtol=1e-6)
+
+
+def test_nearest_resampling(ramp_cube):
+    """Test nearest resampling picks existing bands."""
+    resampler = cuvis.SpectralResampler([409, 431], cuvis.ResamplingMethod.Nearest)
+    resampled = resampler.apply(ramp_cube)
+    np.testing.assert_array_equal(resampled.array[0, 0], [800, 880])
+
+
+def test_gaussian_resampling_preserves_constant():
+    """Test Gaussian SRF weights are normalized."""
+    wavelength = np.arange(400, 701, 5)
+    array = np.full((2, 2, len(wavelength)), 3.0)
+    resampler = cuvis.SpectralResampler(
+        [450, 500, 550], cuvis.ResamplingMethod.Gaussian, fwhm=20)
+    out = resampler.apply(array, source_wavelength=wavelength)
+    np.testing.assert_allclose(out, 3.0)
+
+
+def test_weights_are_cached():
+    """Test the weight matrix is computed once per grid pair."""
+    resampler = cuvis.SpectralResampler([450, 500])
+    first = resampler.weights([400, 500, 600])
+    second = resampler.weights(np.array([400, 500, 600]))
+    assert first is second
+
+
+def test_batch_resampling(ramp_cube):
+    """Test a list of cubes is resampled with one call."""
+    resampler = cuvis.SpectralResampler([500, 600])
+    results = resampler.apply([ramp_cube, ramp_cube])
+    assert len(results) == 2
+    assert all(r.channels == 2 for r in results)
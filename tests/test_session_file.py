@@ -67,3 +67,17 @@ def test_session_file_hash(test_session_file):
     hash_val = test_session_file.hash
     assert isinstance(hash_val, str)
     assert len(hash_val) > 0
+
+
+def test_session_file_prefetching_iter(test_session_file):
+    """Test prefetching iteration keeps order and releases passed frames."""
+    frames = []
+    cubes = []
+    for mesu in test_session_file.iter(prefetch=2, workers=2, keys={"cube"}):
+        if frames:
+            assert frames[-1]._handle is None
+            assert cubes[-1].array is None
+        frames.append(mesu)
+        cubes.append(mesu.cube)
+    assert len(frames) == len(test_session_file)
+    assert [m.frame_id for m in frames] == sorted(m.frame_id for m in frames)